@@ -0,0 +1,76 @@
+# 배치 창(window) 크기별 처리량(requests/sec) 측정
+#   python benchmarks/bench_batching.py --model fake
+#   python benchmarks/bench_batching.py --model openpsi --requests 64 --windows 0,20,50
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from models.batching import BatchScheduler
+
+
+class FakeModel:
+    # GPU 생성 비용을 흉내: 배치당 고정 비용 + 행당 소량의 추가 비용
+    def __init__(self, fixed_sec=0.2, per_row_sec=0.01):
+        self.fixed_sec = fixed_sec
+        self.per_row_sec = per_row_sec
+
+    def generate_batch(self, prompts):
+        time.sleep(self.fixed_sec + self.per_row_sec * len(prompts))
+        return [f"reply to {p}" for p in prompts]
+
+
+def load_model(name):
+    if name == "fake":
+        return FakeModel()
+    if name == "openpsi":
+        from models.openpsi_05B_model import OpenPsi05BModel
+        return OpenPsi05BModel()
+    if name == "openpsi3b":
+        from models.openpsi_3B_model import OpenPsi3BModel
+        return OpenPsi3BModel()
+    raise ValueError(f"unknown model: {name}")
+
+
+async def run(model, window_ms, max_batch_size, n_requests, concurrency, prompt):
+    scheduler = BatchScheduler(model, max_batch_size=max_batch_size, batch_window_ms=window_ms)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            await scheduler.submit(f"{prompt} {i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(n_requests)))
+    elapsed = time.perf_counter() - start
+    scheduler.close()
+    return n_requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", default="fake", choices=["fake", "openpsi", "openpsi3b"])
+    parser.add_argument("--windows", default="0,5,10,20,50", help="배치 창 크기 목록 (ms)")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=128)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--prompt", default="Therapist: How was your week?")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    print(f"model={args.model} requests={args.requests} concurrency={args.concurrency}")
+    print(f"{'window_ms':>10} {'max_batch':>10} {'req/s':>10}")
+
+    # 배치 없이 한 건씩 처리하는 기준값
+    baseline = asyncio.run(run(model, 0, 1, args.requests, args.concurrency, args.prompt))
+    print(f"{'-':>10} {1:>10} {baseline:>10.2f}")
+    for window in [float(w) for w in args.windows.split(",")]:
+        rps = asyncio.run(run(model, window, args.max_batch_size, args.requests, args.concurrency, args.prompt))
+        print(f"{window:>10g} {args.max_batch_size:>10} {rps:>10.2f}  (x{rps / baseline:.1f})")
+
+
+if __name__ == "__main__":
+    main()
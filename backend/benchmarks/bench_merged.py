@@ -0,0 +1,56 @@
+# 어댑터(PeftModel) vs 병합된 가중치의 CPU 생성 속도(tokens/sec) 비교
+#   python benchmarks/bench_merged.py --model-path openpsi_0.5b/checkpoint-124
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import torch
+from models.local_model import LocalPeftModel
+from models.merged import export_merged
+
+
+def tokens_per_sec(local_model, prompt, new_tokens, runs):
+    inputs = local_model.tokenizer(prompt, return_tensors="pt").to(local_model.model.device)
+    # 생성 길이를 고정해 두 모델이 같은 토큰 수를 만들도록 함
+    kwargs = dict(max_new_tokens=new_tokens, min_new_tokens=new_tokens, do_sample=False,
+                  pad_token_id=local_model.tokenizer.pad_token_id)
+    with torch.no_grad():
+        local_model.model.generate(**inputs, **dict(kwargs, max_new_tokens=2, min_new_tokens=2))
+        start = time.perf_counter()
+        for _ in range(runs):
+            local_model.model.generate(**inputs, **kwargs)
+        elapsed = time.perf_counter() - start
+    return new_tokens * runs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-path", default="openpsi_0.5b/checkpoint-124")
+    parser.add_argument("--new-tokens", type=int, default=64)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--prompt", default="Therapist: How have you been feeling this week?\nXXX:")
+    args = parser.parse_args()
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    export_merged(args.model_path)
+
+    results = {}
+    for name, use_merged in [("adapter", False), ("merged", True)]:
+        start = time.perf_counter()
+        local_model = LocalPeftModel(args.model_path, use_merged=use_merged, device="cpu", torch_dtype=torch.float32)
+        load_sec = time.perf_counter() - start
+        assert local_model.merged == use_merged
+        results[name] = tokens_per_sec(local_model, args.prompt, args.new_tokens, args.runs)
+        print(f"{name:>8}: load {load_sec:6.1f}s, {results[name]:7.2f} tokens/sec")
+        del local_model
+
+    print(f"speedup: x{results['merged'] / results['adapter']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# 동시 부하에서 OpenAI 호출 지연(p50/p99) 측정: 요청마다 새 클라이언트 vs 공유 연결 풀 클라이언트
+#   python benchmarks/bench_openai_client.py                      # mock 서버를 자동으로 띄움
+#   python benchmarks/bench_openai_client.py --base-url http://localhost:9000/v1
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+from models.openai_client import OpenAIClient
+
+PAYLOAD = {
+    "model": "gpt-4o",
+    "messages": [{"role": "user", "content": "Therapist: How was your week?"}],
+    "temperature": 0.7,
+}
+
+
+def start_mock_server(port):
+    import uvicorn
+    from benchmarks.mock_openai import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def percentile(values, q):
+    return statistics.quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+async def run(call, n_requests, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await call()
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(n_requests)))
+    return latencies, time.perf_counter() - start, errors
+
+
+def report(name, latencies, elapsed, errors):
+    ms = [l * 1000 for l in latencies]
+    print(f"{name:>12}: p50 {percentile(ms, 50):7.1f}ms  p99 {percentile(ms, 99):7.1f}ms  "
+          f"{len(ms) / elapsed:7.1f} req/s  errors {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default=None, help="미지정 시 로컬 mock 서버를 띄워 사용")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+
+    base_url = args.base_url or start_mock_server(args.port)
+    print(f"base_url={base_url} requests={args.requests} concurrency={args.concurrency}")
+
+    async def per_request():
+        # 기존 GPT4OModel 방식: 호출마다 새 AsyncClient (매번 TCP/TLS 연결)
+        async with httpx.AsyncClient() as client:
+            response = await client.post(f"{base_url}/chat/completions", json=PAYLOAD)
+            response.raise_for_status()
+
+    pooled_client = OpenAIClient(base_url=base_url, api_key="mock", max_concurrency=args.concurrency, rpm=0, tpm=0)
+
+    async def pooled():
+        await pooled_client.chat_completions(PAYLOAD)
+
+    async def bench():
+        report("per-request", *await run(per_request, args.requests, args.concurrency))
+        report("pooled", *await run(pooled, args.requests, args.concurrency))
+        print(f"retries={pooled_client.retries}")
+        await pooled_client.aclose()
+
+    asyncio.run(bench())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# 로컬 테스트용 OpenAI Chat Completions mock 서버
+#   uvicorn benchmarks.mock_openai:app --port 9000
+#   OPENAI_BASE_URL=http://localhost:9000/v1 uvicorn main:app
+import asyncio
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "50"))
+MOCK_JITTER_MS = float(os.getenv("MOCK_JITTER_MS", "20"))
+# 일정 비율로 429/500을 돌려 재시도 동작을 확인
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+MOCK_REPLY = "I guess... it's been a hard week. I keep thinking I messed everything up."
+
+app = FastAPI()
+stats = {"requests": 0, "errors": 0}
+
+
+def completion(model: str, content: str) -> dict:
+    return {
+        "id": f"chatcmpl-mock-{stats['requests']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(req: Request):
+    body = await req.json()
+    stats["requests"] += 1
+    await asyncio.sleep(max(0.0, random.gauss(MOCK_LATENCY_MS, MOCK_JITTER_MS)) / 1000)
+
+    if random.random() < MOCK_ERROR_RATE:
+        stats["errors"] += 1
+        status = random.choice([429, 500])
+        return JSONResponse({"error": {"message": "mock error"}}, status_code=status, headers={"Retry-After": "0"})
+
+    model = body.get("model", "mock")
+    if not body.get("stream"):
+        return completion(model, MOCK_REPLY)
+
+    async def chunks():
+        for word in MOCK_REPLY.split(" "):
+            delta = {"choices": [{"index": 0, "delta": {"content": word + " "}}]}
+            yield f"data: {json.dumps(delta)}\n\n"
+            await asyncio.sleep(0.005)
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(chunks(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
@@ -3,14 +3,27 @@ load_dotenv()
 
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 import asyncio
 import json
+import os
 from pathlib import Path
 
 from models.registry import model_registry
+from models.executor import call_generate, call_maybe_async
+from models.prefix_cache import prefix_cache
+from models.openai_client import openai_client
+from sessions import session_store
+from vote_store import VoteStore, VOTE_OUTCOMES
+from response_cache import response_cache
+from patient_store import PatientStore, PATIENT_DB_PATH
 
 app = FastAPI()
 
+# 서버 기동 후 미리 올려둘 모델 (예: PRELOAD_MODELS=openpsi,gpt4o). 기본은 첫 요청 시 로드
+PRELOAD_MODELS = [key.strip() for key in os.getenv("PRELOAD_MODELS", "").split(",") if key.strip()]
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
 # CORS 설정
 app.add_middleware(
     CORSMiddleware,
@@ -19,15 +32,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# 리더보드 초기화
-leaderboard = {
-    key: 0 for key in model_registry.keys()
-}
-leaderboard.update({"Tie": 0, "Both Bad": 0})
+# 리더보드: 투표는 SQLite에 저장하고 집계/레이팅은 메모리 스냅샷에서 제공
+vote_store = VoteStore(model_registry.keys())
+
+# 모델별 응답 제한 시간 (초). 시간 초과된 모델은 부분 결과로 표시
+MODEL_TIMEOUT_SEC = float(os.getenv("MODEL_TIMEOUT_SEC", "120"))
 
+# 환자 프로필은 SQLite 저장소에서 위치(patient_id)로 조회. patient_example.json이 바뀌었을 때만 저장소를 다시 만듦
 PATIENT_DATA_PATH = Path(__file__).parent / "patient_example.json"
-with open(PATIENT_DATA_PATH, "r", encoding="utf-8") as f:
-    patient_examples = json.load(f)
+patient_store = PatientStore.open(PATIENT_DB_PATH, PATIENT_DATA_PATH)
 
 base_prompt_template = (
     """
@@ -105,11 +118,11 @@ XXX:
 """
 )
 
-@app.post("/compare")
-async def compare_models(req: Request):
-    data = await req.json()
+# 프롬프트 마지막의 환자 발화 시작 부분. 세션에서는 이 앞까지를 persona로 사용
+PATIENT_CUE = "XXX:\n"
+
+def build_system_prompt(data: dict) -> str:
     user_msg = data.get("message", "").strip()
-    model_order = data.get("model_order", list(model_registry.keys()))
     patient_id = data.get("patient_id", -1)
 
     if patient_id == -1:
@@ -139,9 +152,8 @@ async def compare_models(req: Request):
         )
 
     else:
-        try:
-            patient_info = patient_examples[patient_id]
-        except (IndexError, KeyError):
+        patient_info = patient_store.at(patient_id) if isinstance(patient_id, int) and patient_id >= 0 else None
+        if patient_info is None:
             raise HTTPException(status_code=400, detail="유효하지 않은 환자 ID입니다.")
 
         system_prompt = base_prompt_template.format(
@@ -158,44 +170,264 @@ async def compare_models(req: Request):
             user_msg=user_msg
         )
 
-    results = {}
-    for model_key in model_order:
-        model = model_registry.get(model_key)
-        if model is None:
-            results[model_key] = "[모델 미등록]"
-            continue
+    return system_prompt
+
+@app.post("/compare")
+async def compare_models(req: Request):
+    data = await req.json()
+    model_order = data.get("model_order", list(model_registry.keys()))
+    system_prompt = build_system_prompt(data)
+
+    async def run_model(model_key):
+        try:
+            model = await model_registry.acquire(model_key)
+            if model is None:
+                return "[모델 미등록]"
+            slot, cached = await response_cache.lookup(model_key, model, system_prompt)
+            if cached is not None:
+                return cached
+            response = await asyncio.wait_for(call_generate(model, system_prompt), timeout=MODEL_TIMEOUT_SEC)
+            await response_cache.store(slot, response)
+            return response
+        except asyncio.TimeoutError:
+            return f"[{model_key} 응답 시간 초과]"
+        except Exception as e:
+            return f"[{model_key} 응답 오류: {e}]"
+
+    # 모든 모델에 동시에 요청 → 전체 지연 시간은 가장 느린 모델 기준
+    responses = await asyncio.gather(*(run_model(key) for key in model_order))
+    return dict(zip(model_order, responses))
+
+SLOT_NAMES = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+def sse_event(event: str, payload: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+@app.post("/compare/stream")
+async def compare_models_stream(req: Request):
+    data = await req.json()
+    model_order = data.get("model_order", list(model_registry.keys()))
+    system_prompt = build_system_prompt(data)
+    queue = asyncio.Queue()
 
+    async def stream_model(slot, model_key):
         try:
-            generate_func = model.generate
-            if asyncio.iscoroutinefunction(generate_func):
-                results[model_key] = await generate_func(system_prompt)
+            model = await model_registry.acquire(model_key)
+        except Exception as e:
+            await queue.put(("error", {"slot": slot, "message": f"[{model_key} 로드 오류: {e}]"}))
+            return
+        if model is None:
+            await queue.put(("error", {"slot": slot, "message": "[모델 미등록]"}))
+            return
+
+        async def produce():
+            cache_slot, cached = await response_cache.lookup(model_key, model, system_prompt)
+            if cached is not None:
+                await queue.put(("token", {"slot": slot, "text": cached}))
+                return
+
+            if hasattr(model, "stream"):
+                chunks = []
+                async for text in model.stream(system_prompt):
+                    chunks.append(text)
+                    await queue.put(("token", {"slot": slot, "text": text}))
+                response = "".join(chunks).strip()
             else:
-                results[model_key] = generate_func(system_prompt)
+                # 스트리밍을 지원하지 않는 모델은 완성된 응답을 한 번에 전달
+                response = await call_generate(model, system_prompt)
+                await queue.put(("token", {"slot": slot, "text": response}))
+            await response_cache.store(cache_slot, response)
+
+        try:
+            await asyncio.wait_for(produce(), timeout=MODEL_TIMEOUT_SEC)
+            await queue.put(("done", {"slot": slot}))
+        except asyncio.TimeoutError:
+            await queue.put(("error", {"slot": slot, "message": f"[{model_key} 응답 시간 초과]"}))
         except Exception as e:
-            results[model_key] = f"[{model_key} 응답 오류: {e}]"
+            await queue.put(("error", {"slot": slot, "message": f"[{model_key} 응답 오류: {e}]"}))
 
+    async def event_stream():
+        tasks = [
+            asyncio.create_task(stream_model(SLOT_NAMES[i], key))
+            for i, key in enumerate(model_order)
+        ]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                event, payload = await queue.get()
+                if event in ("done", "error"):
+                    remaining -= 1
+                yield sse_event(event, payload)
+            yield sse_event("end", {})
+        finally:
+            # 클라이언트 연결이 끊기면 남은 생성 작업 취소
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# 멀티턴 세션: 환자/모델 순서로 세션을 만들고 치료자 발화를 턴 단위로 전송
+@app.post("/sessions")
+async def create_session(req: Request):
+    data = await req.json()
+    model_order = data.get("model_order", list(model_registry.keys()))
+    unknown = [key for key in model_order if key not in model_registry]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"등록되지 않은 모델: {', '.join(unknown)}")
+
+    persona = build_system_prompt(data).removesuffix(PATIENT_CUE)
+    session = session_store.create(persona, model_order)
+    return {"session_id": session.id, "model_order": session.model_order}
+
+@app.post("/sessions/{session_id}/turns")
+async def post_session_turn(session_id: str, req: Request):
+    data = await req.json()
+    message = data.get("message", "").strip()
+    if not message:
+        raise HTTPException(status_code=400, detail="메시지를 입력해주세요.")
+
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="세션이 없거나 만료되었습니다.")
+
+    async def run_model(model_key):
+        try:
+            model = await model_registry.acquire(model_key)
+            if model_key not in session.states:
+                session.states[model_key] = model.new_session(session.persona)
+            return await asyncio.wait_for(
+                call_maybe_async(model.continue_session, session.states[model_key], message),
+                timeout=MODEL_TIMEOUT_SEC
+            )
+        except asyncio.TimeoutError:
+            # 시간 초과된 생성은 스레드에서 계속 상태를 바꿀 수 있으므로 해당 모델 상태는 버리고 다음 턴에 새로 시작
+            session.states.pop(model_key, None)
+            return f"[{model_key} 응답 시간 초과]"
+        except Exception as e:
+            return f"[{model_key} 응답 오류: {e}]"
+
+    # 같은 세션의 턴은 순서대로 처리
+    async with session.lock:
+        responses = await asyncio.gather(*(run_model(key) for key in session.model_order))
+        results = dict(zip(session.model_order, responses))
+        session.turns.append({"therapist": message, "responses": results})
+
+    session_store.evict()
     return results
 
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = session_store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="세션이 없거나 만료되었습니다.")
+    return {"session_id": session.id, "model_order": session.model_order, "turns": session.turns}
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    if not session_store.delete(session_id):
+        raise HTTPException(status_code=404, detail="세션이 없거나 만료되었습니다.")
+    return {"message": "세션이 삭제되었습니다."}
+
 @app.post("/vote")
 async def vote(req: Request):
     data = await req.json()
-    model_order = data.get("model_order", list(model_registry.keys()))
+    model_order = data.get("model_order")
     vote_option = data.get("vote", "")
 
-    if vote_option not in ["A is better", "B is better", "Tie", "Both are bad"]:
+    if vote_option not in VOTE_OUTCOMES:
         raise HTTPException(status_code=400, detail="잘못된 투표 옵션입니다.")
+    if (
+        not isinstance(model_order, list) or len(model_order) != 2
+        or model_order[0] == model_order[1]
+        or any(key not in model_registry for key in model_order)
+    ):
+        raise HTTPException(status_code=400, detail="잘못된 모델 순서입니다.")
 
-    if vote_option == "A is better":
-        leaderboard[model_order[0]] += 1
-    elif vote_option == "B is better":
-        leaderboard[model_order[1]] += 1
-    elif vote_option == "Tie":
-        leaderboard["Tie"] += 1
-    elif vote_option == "Both are bad":
-        leaderboard["Both Bad"] += 1
-
+    vote_store.record(model_order[0], model_order[1], vote_option)
     return {"message": "투표가 성공적으로 반영되었습니다."}
 
 @app.get("/leaderboard")
 async def get_leaderboard():
-    return leaderboard
\ No newline at end of file
+    return vote_store.snapshot
+
+@app.get("/leaderboard/ratings")
+async def get_ratings():
+    return vote_store.ratings
+
+# 환자 목록 조회 (예: /patients?core_belief_category=helpless&conversational_style=reserved). patient_id = position
+@app.get("/patients")
+async def list_patients(core_belief: str = None, core_belief_category: str = None, conversational_style: str = None,
+                        situation_type: str = None, limit: int = 50, offset: int = 0):
+    positions = patient_store.positions(
+        limit=min(max(limit, 0), 500), offset=max(offset, 0), core_belief=core_belief,
+        core_belief_category=core_belief_category, conversational_style=conversational_style, situation_type=situation_type,
+    )
+    patients = []
+    for position in positions:
+        patient = patient_store.at(position)
+        patients.append({
+            "patient_id": position,
+            "id": patient.get("id"),
+            "core_beliefs": patient.get("core_beliefs", []),
+            "conversational_styles": patient.get("conversational_styles", []),
+            "situation_type": patient.get("situation_type"),
+        })
+    return {"total": len(patient_store), "patients": patients}
+
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "prefix_cache": prefix_cache.stats(),
+        "sessions": session_store.stats(),
+        "openai": {"retries": openai_client.retries},
+        "response_cache": response_cache.stats(),
+    }
+
+@app.on_event("startup")
+async def start_vote_store():
+    await vote_store.start()
+
+@app.on_event("startup")
+async def preload_models():
+    # 포트 바인딩을 막지 않도록 백그라운드에서 로드
+    for key in PRELOAD_MODELS:
+        asyncio.create_task(model_registry.warmup(key))
+
+@app.on_event("shutdown")
+async def close_clients():
+    await openai_client.aclose()
+    await vote_store.close()
+
+# 모델 관리 (ADMIN_TOKEN이 설정된 경우 X-Admin-Token 헤더 필요)
+def check_admin(req: Request, model_key: str = None):
+    if ADMIN_TOKEN and req.headers.get("X-Admin-Token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="관리자 권한이 필요합니다.")
+    if model_key is not None and model_key not in model_registry:
+        raise HTTPException(status_code=404, detail="등록되지 않은 모델입니다.")
+
+@app.get("/admin/models")
+async def list_models(req: Request):
+    check_admin(req)
+    return model_registry.status()
+
+@app.post("/admin/models/{model_key}/load")
+async def load_model(model_key: str, req: Request):
+    check_admin(req, model_key)
+    await model_registry.acquire(model_key)
+    return model_registry.status()
+
+@app.post("/admin/models/{model_key}/unload")
+async def unload_model(model_key: str, req: Request):
+    check_admin(req, model_key)
+    await model_registry.unload(model_key)
+    return model_registry.status()
+
+@app.post("/admin/models/{model_key}/warmup")
+async def warmup_model(model_key: str, req: Request):
+    check_admin(req, model_key)
+    await model_registry.warmup(model_key)
+    return model_registry.status()
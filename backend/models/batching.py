@@ -0,0 +1,118 @@
+from .base import BaseModel
+from .executor import run_local
+import asyncio
+import os
+
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "20"))
+
+
+class BatchScheduler:
+    # 짧은 시간 창(window) 동안 들어온 프롬프트를 모아 model.generate_batch 한 번으로 처리
+    def __init__(self, model, max_batch_size: int = BATCH_MAX_SIZE, batch_window_ms: float = BATCH_WINDOW_MS):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window_ms / 1000
+        self.queue = None
+        self._worker = None
+
+    async def submit(self, prompt: str) -> str:
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((prompt, future))
+        return await future
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self.queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+
+    async def _collect(self):
+        # (배치, 종료 여부) 반환. None은 close()가 넣는 종료 신호
+        first = await self.queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_window
+        while len(batch) < self.max_batch_size:
+            # 이미 대기 중인 요청은 창 크기와 상관없이 바로 합류
+            if not self.queue.empty():
+                item = self.queue.get_nowait()
+            else:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run(self):
+        stop = False
+        while not stop:
+            batch, stop = await self._collect()
+            # 타임아웃 등으로 이미 취소된 요청은 배치에서 제외
+            batch = [(prompt, future) for prompt, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                outputs = await run_local(self.model.generate_batch, [prompt for prompt, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    def close(self):
+        # 이미 큐에 들어온 요청까지 처리한 뒤 워커 종료
+        if self._worker is not None and not self._worker.done():
+            self.queue.put_nowait(None)
+        self._worker = None
+
+
+class BatchedModel(BaseModel):
+    # 로컬 모델을 감싸 동시 요청을 마이크로 배치로 묶어 처리하는 async 모델
+    def __init__(self, model, max_batch_size: int = BATCH_MAX_SIZE, batch_window_ms: float = BATCH_WINDOW_MS):
+        self.model = model
+        self.scheduler = BatchScheduler(model, max_batch_size, batch_window_ms)
+
+    async def generate(self, prompt: str) -> str:
+        return await self.scheduler.submit(prompt)
+
+    def stream(self, prompt: str):
+        # 스트리밍은 토큰 단위로 바로 흘려보내야 하므로 배치를 거치지 않음
+        return self.model.stream(prompt)
+
+    def new_session(self, persona: str):
+        return self.model.new_session(persona)
+
+    def continue_session(self, state, message: str) -> str:
+        # 세션 턴은 세션별 KV 캐시를 이어 쓰므로 배치를 거치지 않음
+        return self.model.continue_session(state, message)
+
+    async def warmup(self):
+        await run_local(self.model.warmup)
+
+    def memory_bytes(self) -> int:
+        return self.model.memory_bytes()
+
+    @property
+    def checkpoint_hash(self) -> str:
+        return self.model.checkpoint_hash
+
+    @property
+    def sampling_params(self) -> dict:
+        return self.model.sampling_params
+
+    def close(self):
+        self.scheduler.close()
@@ -0,0 +1,28 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# 로컬 HF 모델(torch generate)은 이벤트 루프를 막지 않도록 별도 스레드 풀에서 실행
+LOCAL_MODEL_WORKERS = int(os.getenv("LOCAL_MODEL_WORKERS", "2"))
+
+local_executor = ThreadPoolExecutor(
+    max_workers=LOCAL_MODEL_WORKERS,
+    thread_name_prefix="local-model",
+)
+
+
+async def run_local(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(local_executor, partial(func, *args, **kwargs))
+
+
+async def call_maybe_async(func, *args, **kwargs):
+    # async 함수(GPT4OModel 등)는 그대로 await, 동기 함수는 스레드 풀로 보냄
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_local(func, *args, **kwargs)
+
+
+async def call_generate(model, prompt: str) -> str:
+    return await call_maybe_async(model.generate, prompt)
@@ -1,21 +1,61 @@
 from .base import BaseModel
-import httpx
-import os
+from .openai_client import openai_client
+import json
+
+# 역할 전환 표시가 나오면 API 쪽에서 바로 생성을 멈추게 함 (로컬 모델의 TurnStoppingCriteria와 같은 기준)
+ROLE_STOPS = ["Therapist:", "XXX:"]
 
 class GPT4OModel(BaseModel):
-    def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
+    def __init__(self, client=openai_client):
+        self.client = client
         self.model_id = "gpt-4o"
-        self.url = "https://api.openai.com/v1/chat/completions"
+        self.temperature = 0.7
+
+    @property
+    def sampling_params(self) -> dict:
+        return {"temperature": self.temperature, "stop": ROLE_STOPS}
 
     async def generate(self, prompt: str) -> str:
-        headers = {"Authorization": f"Bearer {self.api_key}"}
+        return await self.chat([{"role": "user", "content": prompt}])
+
+    async def chat(self, messages: list[dict]) -> str:
+        data = {
+            "model": self.model_id,
+            "messages": messages,
+            "temperature": self.temperature,
+            "stop": ROLE_STOPS
+        }
+        response = await self.client.chat_completions(data)
+        return response["choices"][0]["message"]["content"].strip()
+
+    def new_session(self, persona: str) -> list[dict]:
+        # API 모델의 세션 상태는 대화 messages 목록
+        return [{"role": "system", "content": persona}]
+
+    async def continue_session(self, messages: list[dict], message: str) -> str:
+        messages.append({"role": "user", "content": message})
+        try:
+            reply = await self.chat(messages)
+        except Exception:
+            messages.pop()
+            raise
+        messages.append({"role": "assistant", "content": reply})
+        return reply
+
+    async def stream(self, prompt: str):
         data = {
             "model": self.model_id,
-            "messages": [{"role": "user", "content": prompt}], 
-            "temperature": 0.7
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.temperature,
+            "stop": ROLE_STOPS
         }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(self.url, headers=headers, json=data)
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"].strip()
\ No newline at end of file
+        async with self.client.stream_chat(data) as response:
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                payload = line[len("data:"):].strip()
+                if payload == "[DONE]":
+                    break
+                delta = json.loads(payload)["choices"][0]["delta"]
+                if delta.get("content"):
+                    yield delta["content"]
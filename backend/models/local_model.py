@@ -0,0 +1,244 @@
+from .base import BaseModel
+from .executor import run_local
+from .merged import checkpoint_hash, merged_path, is_exported
+from .prefix_cache import prefix_cache, cache_nbytes
+from transformers import AutoTokenizer, AutoModelForCausalLM, TextStreamer, StoppingCriteria, StoppingCriteriaList, DynamicCache
+from peft import PeftModel, PeftConfig
+from pathlib import Path
+import asyncio
+import copy
+import hashlib
+import os
+import sys
+import threading
+import torch
+
+# 출력 후처리/턴 종료 판단은 patientv2/inference의 postprocess.py, stopping.py를 그대로 사용
+# (오프라인 생성/평가와 같은 종료 시퀀스에서 멈추고 같은 위치에서 잘림)
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "patientv2"))
+from inference.postprocess import stop_token_ids, cut_at_stop, postprocess_tokens, truncate_sentences, StreamStopFilter, MAX_SENTENCES
+from inference.stopping import TurnStoppingCriteria
+
+
+class AsyncQueueStreamer(TextStreamer):
+    # TextIteratorStreamer와 같은 방식이지만, 생성 스레드에서 asyncio.Queue로 텍스트 조각을 넘김
+    def __init__(self, tokenizer, loop, queue, **decode_kwargs):
+        super().__init__(tokenizer, skip_prompt=True, **decode_kwargs)
+        self.loop = loop
+        self.queue = queue
+
+    def on_finalized_text(self, text: str, stream_end: bool = False):
+        if text:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, text)
+        if stream_end:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+
+# 병합된 체크포인트(models/merged.py로 생성)가 있으면 어댑터 대신 사용
+USE_MERGED_WEIGHTS = os.getenv("USE_MERGED_WEIGHTS", "1") != "0"
+
+
+class LocalSessionState:
+    # 세션별 누적 토큰과 그에 대한 KV 캐시. 새 턴에서는 추가된 토큰만 prefill
+    def __init__(self, persona: str):
+        self.persona = persona
+        self.input_ids = None
+        self.cache = None
+        self.nbytes = 0
+
+
+class EventStoppingCriteria(StoppingCriteria):
+    # 클라이언트 연결이 끊기면 event를 세워 생성 스레드를 조기 종료
+    def __init__(self, event: threading.Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
+
+class LocalPeftModel(BaseModel):
+    # OpenPsi 계열 공통: 베이스 모델 + LoRA 어댑터를 로드해 로컬에서 생성
+    max_new_tokens = 512
+    temperature = 0.7
+    top_p = 0.9
+
+    def __init__(self, model_path: str, use_merged: bool = USE_MERGED_WEIGHTS, device: str = None, torch_dtype=torch.float16):
+        self.model_path = model_path
+        self.checkpoint_hash = checkpoint_hash(model_path)
+        merged_dir = merged_path(model_path, self.checkpoint_hash)
+
+        self.merged = use_merged and is_exported(merged_dir)
+        if self.merged:
+            # 어댑터 matmul 없이 병합된 가중치를 바로 로드
+            self.model = AutoModelForCausalLM.from_pretrained(merged_dir, torch_dtype=torch_dtype)
+        else:
+            peft_config = PeftConfig.from_pretrained(model_path, local_files_only=True)
+            base_model = AutoModelForCausalLM.from_pretrained(
+                peft_config.base_model_name_or_path, torch_dtype=torch_dtype
+            )
+            self.model = PeftModel.from_pretrained(base_model, model_path)
+        self.model.eval()
+        self.model.to(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path)
+        # 배치 생성 시 프롬프트 끝이 맞춰지도록 왼쪽 패딩
+        self.tokenizer.padding_side = "left"
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.stop_ids = stop_token_ids(self.tokenizer)
+
+    def warmup(self):
+        # CUDA 커널/캐시 초기화를 위해 짧게 한 번 생성
+        inputs = self.tokenizer("Hello", return_tensors="pt").to(self.model.device)
+        with torch.no_grad():
+            self.model.generate(**inputs, max_new_tokens=1, pad_token_id=self.tokenizer.pad_token_id)
+
+    def memory_bytes(self) -> int:
+        return self.model.get_memory_footprint()
+
+    @property
+    def sampling_params(self) -> dict:
+        return {
+            "max_new_tokens": self.max_new_tokens,
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "max_sentences": MAX_SENTENCES,
+        }
+
+    def _prefix_kv(self, prefix_ids):
+        # prefix_ids 전체에 대한 KV를 prefix 캐시에서 가져오거나 새로 계산해 저장 (항상 복사본 반환)
+        prefix_hash = hashlib.sha256(str(prefix_ids[0].tolist()).encode()).hexdigest()
+        key = (self.checkpoint_hash, self.merged, prefix_hash)
+        cache = prefix_cache.get(key)
+        if cache is None:
+            with torch.no_grad():
+                cache = self.model(input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True).past_key_values
+            prefix_cache.put(key, cache)
+            cache = copy.deepcopy(cache)
+        return cache
+
+    def _prepare(self, prompt: str):
+        # 단일 프롬프트 입력 준비. 마지막 토큰 앞까지(prefix)의 KV는 캐시 재사용
+        input_ids = self.tokenizer(prompt, return_tensors="pt").input_ids.to(self.model.device)
+        inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+        if not prefix_cache.enabled or input_ids.shape[1] < 2:
+            return inputs, {}
+        return inputs, {"past_key_values": self._prefix_kv(input_ids[:, :-1])}
+
+    def generate(self, prompt: str) -> str:
+        inputs, kwargs = self._prepare(prompt)
+        output = self._generate(inputs, **kwargs)
+        new_tokens = output[0, inputs["input_ids"].shape[1]:]
+        return postprocess_tokens(self.tokenizer, new_tokens.tolist(), self.stop_ids)
+
+    def _generate(self, inputs, stopping_criteria=None, **kwargs):
+        # 환자 턴이 끝나면(종료 토큰, 역할 전환, 문장 수 제한) max_new_tokens까지 가지 않고 멈춤
+        criteria = StoppingCriteriaList([TurnStoppingCriteria(self.tokenizer, inputs["input_ids"].shape[1], self.stop_ids)])
+        criteria.extend(stopping_criteria or [])
+        with torch.no_grad():
+            return self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                do_sample=True,
+                temperature=self.temperature,
+                top_p=self.top_p,
+                pad_token_id=self.tokenizer.pad_token_id,
+                stopping_criteria=criteria,
+                **kwargs
+            )
+
+    def new_session(self, persona: str) -> LocalSessionState:
+        return LocalSessionState(persona)
+
+    def continue_session(self, state: LocalSessionState, message: str) -> str:
+        segment = f"Therapist: {message}\nXXX:"
+        if state.input_ids is None:
+            # 첫 턴: 환자 persona 부분은 prefix 캐시를 공유
+            input_ids = self.tokenizer(state.persona, return_tensors="pt").input_ids.to(self.model.device)
+            cache = self._prefix_kv(input_ids) if prefix_cache.enabled else DynamicCache()
+        else:
+            segment = "\n" + segment
+            input_ids, cache = state.input_ids, state.cache
+
+        segment_ids = self.tokenizer(segment, return_tensors="pt").input_ids.to(self.model.device)
+        input_ids = torch.cat([input_ids, segment_ids], dim=1)
+        try:
+            output = self._generate(
+                {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)},
+                past_key_values=cache,
+                return_dict_in_generate=True
+            )
+        except Exception:
+            # generate가 캐시를 제자리에서 늘렸을 수 있으므로 이전 턴 길이로 되돌림
+            if state.cache is not None:
+                state.cache.crop(state.input_ids.shape[1])
+            raise
+
+        # 종료 시퀀스(EOS, 역할 전환 등) 앞까지만 대화 기록에 남김
+        generated = cut_at_stop(output.sequences[0, input_ids.shape[1]:].tolist(), self.stop_ids)
+        text = self.tokenizer.decode(generated, skip_special_tokens=True).strip()
+        reply = truncate_sentences(text)
+        cache_len = input_ids.shape[1] + len(generated)
+        if reply != text:
+            # 문장 수 제한으로 잘린 경우 잘린 답변을 다시 토큰화해 기록. 생성 부분 KV는 다음 턴에 다시 prefill
+            generated = self.tokenizer(" " + reply, add_special_tokens=False).input_ids
+            cache_len = input_ids.shape[1]
+
+        generated = torch.tensor([generated], dtype=input_ids.dtype, device=input_ids.device)
+        state.input_ids = torch.cat([input_ids, generated], dim=1)
+        state.cache = output.past_key_values
+        state.cache.crop(cache_len)
+        state.nbytes = cache_nbytes(state.cache)
+        return reply
+
+    def generate_batch(self, prompts: list[str]) -> list[str]:
+        # 단일 요청은 prefix 캐시 경로로 처리 (프롬프트 길이가 다른 배치는 캐시를 공유할 수 없음)
+        if len(prompts) == 1:
+            return [self.generate(prompts[0])]
+
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+        output = self._generate(inputs)
+
+        # 왼쪽 패딩이므로 모든 행의 새 토큰은 입력 길이 이후부터 시작
+        new_tokens = output[:, inputs.input_ids.shape[1]:]
+        return [postprocess_tokens(self.tokenizer, row.tolist(), self.stop_ids) for row in new_tokens]
+
+    async def stream(self, prompt: str):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        streamer = AsyncQueueStreamer(self.tokenizer, loop, queue, skip_special_tokens=True)
+        cancelled = threading.Event()
+        stop_filter = StreamStopFilter()
+
+        def generate_with_streamer():
+            try:
+                inputs, kwargs = self._prepare(prompt)
+                self._generate(
+                    inputs,
+                    streamer=streamer,
+                    stopping_criteria=[EventStoppingCriteria(cancelled)],
+                    **kwargs
+                )
+            finally:
+                # 생성 중 예외가 나도 소비 측이 멈추지 않도록 종료 신호 전달
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        task = asyncio.ensure_future(run_local(generate_with_streamer))
+        try:
+            while True:
+                text = await queue.get()
+                if text is None:
+                    break
+                chunk = stop_filter.feed(text)
+                if chunk:
+                    yield chunk
+                if stop_filter.stopped:
+                    # 종료 시퀀스/문장 제한에 도달하면 남은 생성은 중단
+                    break
+            tail = stop_filter.flush()
+            if tail:
+                yield tail
+            cancelled.set()
+            await task
+        finally:
+            cancelled.set()
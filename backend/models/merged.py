@@ -0,0 +1,96 @@
+# LoRA 어댑터를 베이스 가중치에 병합(merge_and_unload)한 체크포인트를 safetensors로 캐시
+#   python -m models.merged openpsi_0.5b/checkpoint-124 openpsi_3b/checkpoint-315
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+MERGED_CACHE_DIR = Path(os.getenv("MERGED_CACHE_DIR", "merged_cache"))
+ADAPTER_FILES = ["adapter_config.json", "adapter_model.safetensors", "adapter_model.bin"]
+BASE_FILE_SUFFIXES = (".json", ".safetensors", ".bin")
+
+
+def _hash_file(hasher, path: Path):
+    hasher.update(path.name.encode())
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+
+
+def checkpoint_hash(model_path) -> str:
+    # 베이스 모델 + 어댑터 내용 해시. 어느 한쪽이라도 바뀌면 다른 캐시 디렉토리를 사용
+    model_path = Path(model_path)
+    with open(model_path / "adapter_config.json", "r") as f:
+        adapter_config = json.load(f)
+
+    hasher = hashlib.sha256()
+    base = adapter_config["base_model_name_or_path"]
+    hasher.update(base.encode())
+    hasher.update(str(adapter_config.get("revision")).encode())
+    # 베이스가 로컬 디렉토리이면 가중치 파일까지 해시, 허브 ID이면 이름/리비전만 사용
+    if Path(base).is_dir():
+        for path in sorted(Path(base).iterdir()):
+            if path.suffix in BASE_FILE_SUFFIXES:
+                _hash_file(hasher, path)
+    for name in ADAPTER_FILES:
+        if (model_path / name).exists():
+            _hash_file(hasher, model_path / name)
+    return hasher.hexdigest()
+
+
+def merged_path(model_path, digest: str = None) -> Path:
+    digest = digest or checkpoint_hash(model_path)
+    name = "_".join(Path(model_path).parts[-2:])
+    return MERGED_CACHE_DIR / f"{name}-{digest[:16]}"
+
+
+def is_exported(path: Path) -> bool:
+    return (path / "merged_info.json").exists()
+
+
+def export_merged(model_path, force: bool = False) -> Path:
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+    from peft import PeftModel, PeftConfig
+
+    digest = checkpoint_hash(model_path)
+    output_dir = merged_path(model_path, digest)
+    if is_exported(output_dir) and not force:
+        print(f"⏩ 이미 병합됨: {output_dir}")
+        return output_dir
+
+    peft_config = PeftConfig.from_pretrained(model_path, local_files_only=True)
+    base_model = AutoModelForCausalLM.from_pretrained(
+        peft_config.base_model_name_or_path, torch_dtype=torch.float16
+    )
+    model = PeftModel.from_pretrained(base_model, model_path).merge_and_unload()
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+
+    # 중간에 실패해도 깨진 캐시가 남지 않도록 임시 디렉토리에 저장 후 교체
+    tmp_dir = output_dir.with_name(output_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    model.save_pretrained(tmp_dir, safe_serialization=True)
+    tokenizer.save_pretrained(tmp_dir)
+    with open(tmp_dir / "merged_info.json", "w") as f:
+        json.dump({
+            "adapter_path": str(model_path),
+            "base_model": peft_config.base_model_name_or_path,
+            "checkpoint_hash": digest,
+        }, f, indent=2)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    os.replace(tmp_dir, output_dir)
+    print(f"✅ 병합 완료: {output_dir}")
+    return output_dir
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("model_paths", nargs="+", help="LoRA 어댑터 체크포인트 경로")
+    parser.add_argument("--force", action="store_true", help="이미 병합된 캐시가 있어도 다시 생성")
+    args = parser.parse_args()
+
+    for path in args.model_paths:
+        export_merged(path, force=args.force)
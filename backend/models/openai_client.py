@@ -0,0 +1,14 @@
+import os
+import sys
+from pathlib import Path
+
+# 공유 OpenAI 클라이언트: 연결 풀, 동시성 제한, RPM/TPM 토큰 버킷, 재시도/백오프는 patientv2/llm/client.py의 OpenAIClient를 그대로 사용
+# OPENAI_BASE_URL을 로컬 mock 서버로 바꾸면 실제 API 없이 테스트 가능
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / "patientv2"))
+from llm.client import OpenAIClient
+
+# 서버 기본값 (데이터 생성/평가 스크립트보다 동시 요청은 많게, 타임아웃은 짧게)
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "60"))
+
+openai_client = OpenAIClient(max_concurrency=OPENAI_MAX_CONCURRENCY, timeout=OPENAI_TIMEOUT_SEC)
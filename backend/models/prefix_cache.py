@@ -0,0 +1,74 @@
+from collections import OrderedDict
+import copy
+import os
+import threading
+
+# 프롬프트 prefix의 past_key_values를 보관하는 메모리 상한 (MB, 0이면 비활성화)
+PREFIX_CACHE_MAX_MB = float(os.getenv("PREFIX_CACHE_MAX_MB", "1024"))
+
+
+def cache_nbytes(cache) -> int:
+    layers = cache.to_legacy_cache() if hasattr(cache, "to_legacy_cache") else cache
+    return sum(t.numel() * t.element_size() for layer in layers for t in layer)
+
+
+class PrefixKVCache:
+    # (모델 체크포인트, prefix 토큰 해시) → past_key_values. 메모리 한도를 넘으면 LRU 순서로 제거
+    def __init__(self, max_mb: float = PREFIX_CACHE_MAX_MB):
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key):
+        # generate가 캐시를 제자리에서 늘리므로 항상 복사본을 반환
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            cache = entry[0]
+        return copy.deepcopy(cache)
+
+    def put(self, key, cache):
+        nbytes = cache_nbytes(cache)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (cache, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "memory_mb": round(self.total_bytes / 1024 ** 2, 2),
+            "max_mb": round(self.max_bytes / 1024 ** 2, 2),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+prefix_cache = PrefixKVCache()
@@ -1,8 +1,160 @@
-from .openpsi_05B_model import OpenPsi05BModel
-from .openpsi_3B_model import OpenPsi3BModel
-from .gpt4o_model import GPT4OModel
-
-model_registry = {
-    "openpsi": OpenPsi05BModel(),
-    "gpt4o": GPT4OModel()
-}
\ No newline at end of file
+from .batching import BatchedModel
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import gc
+import os
+import sys
+import time
+
+# 동시에 메모리에 올려둘 최대 로컬 모델 수 / 최대 용량(GB, 0이면 제한 없음). 원격 API 모델(gpt4o)은 세지 않음
+MAX_RESIDENT_MODELS = int(os.getenv("MAX_RESIDENT_MODELS", "2"))
+MAX_RESIDENT_GB = float(os.getenv("MAX_RESIDENT_GB", "0"))
+# 1이면 OpenPsi 3B(openpsi_3b/checkpoint-315)도 "openpsi3b"로 등록 (기본 비교 대상은 openpsi, gpt4o)
+ENABLE_OPENPSI_3B = os.getenv("ENABLE_OPENPSI_3B", "0") == "1"
+
+
+def memory_bytes(model) -> int:
+    if hasattr(model, "memory_bytes"):
+        return model.memory_bytes()
+    return 0
+
+
+def is_local(model) -> bool:
+    # 메모리를 차지하는 로컬 모델만 memory_bytes를 가짐
+    return hasattr(model, "memory_bytes")
+
+
+class ModelRegistry:
+    # 모델 팩토리만 등록해두고, 처음 사용할 때 로드. 한도를 넘으면 가장 오래 사용하지 않은 모델부터 해제(LRU)
+    def __init__(self, factories: dict, max_models: int = MAX_RESIDENT_MODELS, max_gb: float = MAX_RESIDENT_GB):
+        self.factories = dict(factories)
+        self.max_models = max_models
+        self.max_bytes = int(max_gb * 1024 ** 3)
+        self.loaded = OrderedDict()
+        self.last_used = {}
+        self._locks = {key: asyncio.Lock() for key in self.factories}
+        # 로드는 한 번에 하나씩만 (동시 로드로 메모리가 튀는 것을 방지)
+        self._load_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="model-load")
+
+    def keys(self):
+        return self.factories.keys()
+
+    def __contains__(self, key):
+        return key in self.factories
+
+    def is_loaded(self, key) -> bool:
+        return key in self.loaded
+
+    async def acquire(self, key):
+        # 등록되지 않은 키는 None, 아니면 필요 시 로드한 뒤 반환
+        if key not in self.factories:
+            return None
+        model = self._touch(key)
+        if model is not None:
+            return model
+
+        async with self._locks[key]:
+            model = self._touch(key)
+            if model is None:
+                loop = asyncio.get_running_loop()
+                model = await loop.run_in_executor(self._load_executor, self.factories[key])
+                self.loaded[key] = model
+                self._touch(key)
+                self._evict(keep=key)
+        return model
+
+    async def unload(self, key) -> bool:
+        async with self._locks[key]:
+            model = self.loaded.pop(key, None)
+            if model is None:
+                return False
+            self._release(model)
+            return True
+
+    async def warmup(self, key):
+        model = await self.acquire(key)
+        if model is not None and hasattr(model, "warmup"):
+            await model.warmup()
+        return model
+
+    def status(self) -> list[dict]:
+        return [
+            {
+                "key": key,
+                "loaded": key in self.loaded,
+                "memory_gb": round(memory_bytes(self.loaded[key]) / 1024 ** 3, 3) if key in self.loaded else 0.0,
+                "last_used": self.last_used.get(key),
+            }
+            for key in self.factories
+        ]
+
+    def _touch(self, key):
+        model = self.loaded.get(key)
+        if model is not None:
+            self.loaded.move_to_end(key)
+            self.last_used[key] = time.time()
+        return model
+
+    def _evict(self, keep):
+        # 로컬 모델끼리만 한도를 따지고 해제함 (원격 모델은 해제해도 회수할 메모리가 없음)
+        if not is_local(self.loaded[keep]):
+            return
+
+        def local_keys():
+            return [k for k, m in self.loaded.items() if is_local(m)]
+
+        def over_limit():
+            if len(local_keys()) > self.max_models > 0:
+                return True
+            total = sum(memory_bytes(self.loaded[k]) for k in local_keys())
+            return self.max_bytes > 0 and total > self.max_bytes
+
+        while over_limit() and len(local_keys()) > 1:
+            key = next(k for k in local_keys() if k != keep)
+            self._release(self.loaded.pop(key))
+            print(f"♻️ 모델 해제 (LRU): {key}")
+
+    def _release(self, model):
+        # 진행 중인 요청은 자신의 참조를 들고 있으므로 끝난 뒤에 메모리가 회수됨
+        if hasattr(model, "close"):
+            model.close()
+        gc.collect()
+        torch = sys.modules.get("torch")
+        if torch is not None and torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+
+# 팩토리 안에서 import 해야 서버 기동 시 torch/transformers 로드 비용이 들지 않음
+def openpsi_05b():
+    from .openpsi_05B_model import OpenPsi05BModel
+    return BatchedModel(OpenPsi05BModel())
+
+def openpsi_3b():
+    from .openpsi_3B_model import OpenPsi3BModel
+    return BatchedModel(OpenPsi3BModel())
+
+def gpt4o():
+    from .gpt4o_model import GPT4OModel
+    return GPT4OModel()
+
+def local_checkpoint(model_path):
+    def factory():
+        from .local_model import LocalPeftModel
+        return BatchedModel(LocalPeftModel(model_path))
+    return factory
+
+
+factories = {
+    "openpsi": openpsi_05b,
+    "gpt4o": gpt4o,
+}
+if ENABLE_OPENPSI_3B:
+    factories["openpsi3b"] = openpsi_3b
+
+# 추가 체크포인트 등록: EXTRA_CHECKPOINTS="key1=path/to/ckpt1,key2=path/to/ckpt2"
+for entry in filter(None, os.getenv("EXTRA_CHECKPOINTS", "").split(",")):
+    key, path = entry.split("=", 1)
+    factories[key.strip()] = local_checkpoint(path.strip())
+
+model_registry = ModelRegistry(factories)
@@ -0,0 +1,11 @@
+import os
+import sys
+from pathlib import Path
+
+# 환자 프로필 저장소 (SQLite). 스키마/조회/갱신 판단은 patientv2/data/patient_store.py 하나만 사용
+# patient_example.json을 처음 한 번(또는 파일이 바뀌었을 때만) 변환해 두고, 기동 시에는 stat 비교 후 DB만 열어
+# 환자 위치(프론트엔드의 patient_id)/id/core belief(범주)/대화 스타일/상황 유형으로 바로 조회
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "patientv2"))
+from data.patient_store import PatientStore
+
+PATIENT_DB_PATH = os.getenv("PATIENT_DB_PATH", "patients.db")
@@ -0,0 +1,123 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import time
+
+# /compare 응답 캐시 (기본 비활성화). 같은 키에 대해 최대 k개의 샘플을 모아두고 그중 하나를 무작위로 제공
+RESPONSE_CACHE = os.getenv("RESPONSE_CACHE", "0") == "1"
+RESPONSE_CACHE_SAMPLES = int(os.getenv("RESPONSE_CACHE_SAMPLES", "4"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", "response_cache.db")
+
+
+def cache_key(model_key: str, model, prompt: str) -> str:
+    # (모델 키, 체크포인트 해시, 프롬프트 해시, 샘플링 파라미터) → 키. 샘플 번호(seed)는 별도 슬롯으로 관리
+    signature = {
+        "model_key": model_key,
+        "checkpoint": getattr(model, "checkpoint_hash", None) or getattr(model, "model_id", None),
+        "prompt": hashlib.sha256(prompt.encode()).hexdigest(),
+        "sampling": getattr(model, "sampling_params", {}),
+    }
+    return hashlib.sha256(json.dumps(signature, sort_keys=True).encode()).hexdigest()
+
+
+class ResponseCache:
+    # 메모리 LRU + SQLite 디스크 계층. (key, seed) 슬롯마다 응답 하나를 저장
+    def __init__(
+        self,
+        enabled: bool = RESPONSE_CACHE,
+        samples: int = RESPONSE_CACHE_SAMPLES,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        path: str = RESPONSE_CACHE_PATH,
+    ):
+        self.enabled = enabled
+        self.samples = samples
+        self.max_entries = max_entries
+        self.path = path
+        self.memory = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._conn = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT NOT NULL, seed INTEGER NOT NULL, response TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (key, seed))"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _disk_get(self, key, seed):
+        row = self._connect().execute(
+            "SELECT response FROM responses WHERE key = ? AND seed = ?", (key, seed)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _disk_put(self, key, seed, response):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, seed, response, created_at) VALUES (?, ?, ?, ?)",
+                (key, seed, response, time.time()),
+            )
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _remember(self, slot, response):
+        self.memory[slot] = response
+        self.memory.move_to_end(slot)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    async def lookup(self, model_key: str, model, prompt: str):
+        # (슬롯, 캐시된 응답 또는 None) 반환. 캐시가 꺼져 있으면 슬롯도 None
+        if not self.enabled:
+            return None, None
+        slot = (cache_key(model_key, model, prompt), random.randrange(self.samples))
+        response = self.memory.get(slot)
+        if response is not None:
+            self.memory.move_to_end(slot)
+            self.memory_hits += 1
+            return slot, response
+
+        response = await self._run(self._disk_get, *slot)
+        if response is not None:
+            self._remember(slot, response)
+            self.disk_hits += 1
+            return slot, response
+
+        self.misses += 1
+        return slot, None
+
+    async def store(self, slot, response: str):
+        if slot is None or not response:
+            return
+        self._remember(slot, response)
+        await self._run(self._disk_put, *slot, response)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "samples_per_key": self.samples,
+            "memory_entries": len(self.memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,81 @@
+from collections import OrderedDict
+import asyncio
+import os
+import time
+import uuid
+
+# 유휴 세션 만료 시간(초)과 최대 세션 수 / 세션 상태(KV 캐시 등) 총 메모리 한도(MB)
+SESSION_TTL_SEC = float(os.getenv("SESSION_TTL_SEC", "1800"))
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "256"))
+SESSION_MAX_MB = float(os.getenv("SESSION_MAX_MB", "2048"))
+
+
+def state_nbytes(state) -> int:
+    return getattr(state, "nbytes", 0)
+
+
+class Session:
+    def __init__(self, persona: str, model_order: list[str]):
+        self.id = uuid.uuid4().hex
+        self.persona = persona
+        self.model_order = model_order
+        # 모델별 대화 상태 (로컬 모델은 토큰 + KV 캐시, API 모델은 messages)
+        self.states = {}
+        self.turns = []
+        self.last_active = time.time()
+        self.lock = asyncio.Lock()
+
+    def nbytes(self) -> int:
+        return sum(state_nbytes(state) for state in self.states.values())
+
+
+class SessionStore:
+    # TTL이 지난 세션과, 세션 수/메모리 한도를 넘는 경우 가장 오래 쓰지 않은 세션부터 제거(LRU)
+    def __init__(self, ttl_sec: float = SESSION_TTL_SEC, max_sessions: int = MAX_SESSIONS, max_mb: float = SESSION_MAX_MB):
+        self.ttl_sec = ttl_sec
+        self.max_sessions = max_sessions
+        self.max_bytes = int(max_mb * 1024 ** 2)
+        self.sessions = OrderedDict()
+        self.evictions = 0
+
+    def create(self, persona: str, model_order: list[str]) -> Session:
+        session = Session(persona, model_order)
+        self.sessions[session.id] = session
+        self.evict()
+        return session
+
+    def get(self, session_id: str):
+        session = self.sessions.get(session_id)
+        if session is None:
+            return None
+        if time.time() - session.last_active > self.ttl_sec:
+            self.delete(session_id)
+            return None
+        session.last_active = time.time()
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def delete(self, session_id: str) -> bool:
+        return self.sessions.pop(session_id, None) is not None
+
+    def evict(self):
+        now = time.time()
+        for session_id in [sid for sid, s in self.sessions.items() if now - s.last_active > self.ttl_sec]:
+            self.delete(session_id)
+            self.evictions += 1
+
+        total = sum(s.nbytes() for s in self.sessions.values())
+        while self.sessions and (len(self.sessions) > self.max_sessions or total > self.max_bytes):
+            _, session = self.sessions.popitem(last=False)
+            total -= session.nbytes()
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "memory_mb": round(sum(s.nbytes() for s in self.sessions.values()) / 1024 ** 2, 2),
+            "evictions": self.evictions,
+        }
+
+
+session_store = SessionStore()
@@ -0,0 +1,229 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import math
+import os
+import random
+import sqlite3
+import time
+
+# 투표 저장소 설정
+VOTE_DB_PATH = os.getenv("VOTE_DB_PATH", "votes.db")
+VOTE_FLUSH_MS = float(os.getenv("VOTE_FLUSH_MS", "200"))
+VOTE_BATCH_SIZE = int(os.getenv("VOTE_BATCH_SIZE", "100"))
+RATINGS_REFRESH_SEC = float(os.getenv("RATINGS_REFRESH_SEC", "60"))
+BOOTSTRAP_ROUNDS = int(os.getenv("BOOTSTRAP_ROUNDS", "200"))
+
+ELO_K = 4
+ELO_INIT = 1000
+# 투표 옵션 → (저장 값, A의 점수). 'Both are bad'도 레이팅에서는 무승부로 취급
+VOTE_OUTCOMES = {
+    "A is better": ("A", 1.0),
+    "B is better": ("B", 0.0),
+    "Tie": ("tie", 0.5),
+    "Both are bad": ("both_bad", 0.5),
+}
+OUTCOME_SCORES = {outcome: score for outcome, score in VOTE_OUTCOMES.values()}
+
+
+def fit_bradley_terry(pair_scores: dict, models: list, iters: int = 200, prior: float = 1.0) -> dict:
+    # pair_scores[(a, b)] = (a의 승점, b의 승점). MM 알고리즘으로 BT 강도를 추정해 Elo 척도로 변환
+    # 관측된 쌍마다 가상의 무승부(prior)를 더해 전승/전패 모델도 유한한 값으로 수렴하게 함
+    pairs = {pair: (sa + prior / 2, sb + prior / 2) for pair, (sa, sb) in pair_scores.items()}
+    strength = {m: 1.0 for m in models}
+    wins = {m: 0.0 for m in models}
+    for (a, b), (score_a, score_b) in pairs.items():
+        wins[a] += score_a
+        wins[b] += score_b
+
+    for _ in range(iters):
+        denom = {m: 0.0 for m in models}
+        for (a, b), (score_a, score_b) in pairs.items():
+            d = (score_a + score_b) / (strength[a] + strength[b])
+            denom[a] += d
+            denom[b] += d
+        updated = {m: wins[m] / denom[m] if denom[m] > 0 else strength[m] for m in models}
+        # 기하평균 1로 정규화
+        norm = math.exp(sum(math.log(v) for v in updated.values()) / len(updated))
+        updated = {m: v / norm for m, v in updated.items()}
+        converged = max(abs(updated[m] - strength[m]) for m in models) < 1e-9
+        strength = updated
+        if converged:
+            break
+
+    return {m: ELO_INIT + 400 * math.log10(v) for m, v in strength.items()}
+
+
+def bootstrap_ratings(pair_scores: dict, models: list, rounds: int = BOOTSTRAP_ROUNDS) -> dict:
+    ratings = fit_bradley_terry(pair_scores, models)
+    samples = {m: [] for m in models}
+    for _ in range(rounds):
+        # 투표 단위 재표본 대신 칸별 Poisson(정규 근사) 재표본 → 투표 수와 무관하게 O(모델 쌍 수)
+        resampled = {
+            pair: tuple(max(0.0, random.gauss(s, math.sqrt(s))) for s in scores)
+            for pair, scores in pair_scores.items()
+        }
+        for m, r in fit_bradley_terry(resampled, models).items():
+            samples[m].append(r)
+
+    result = {}
+    for m in models:
+        values = sorted(samples[m])
+        lower = values[int(0.025 * (len(values) - 1))] if values else ratings[m]
+        upper = values[int(0.975 * (len(values) - 1))] if values else ratings[m]
+        result[m] = {"rating": round(ratings[m], 1), "ci_lower": round(lower, 1), "ci_upper": round(upper, 1)}
+    return result
+
+
+class VoteStore:
+    # 투표를 SQLite(WAL)에 배치로 추가하고, DB를 tail 하면서 집계를 증분 갱신
+    # 여러 uvicorn 워커가 같은 DB를 공유해도 각 워커는 커밋된 행만 반영하므로 집계가 일치
+    def __init__(self, models: list, db_path: str = VOTE_DB_PATH):
+        self.models = list(models)
+        self.db_path = db_path
+        self.pending = []
+        self.last_id = 0
+        self.counts = {m: 0 for m in self.models}
+        self.counts.update({"Tie": 0, "Both Bad": 0})
+        self.elo = {m: float(ELO_INIT) for m in self.models}
+        self.pair_scores = {}
+        self.battles = 0
+        self.snapshot = dict(self.counts)
+        self.ratings = {"battles": 0, "elo": {}, "bradley_terry": {}, "updated_at": None}
+        self._ratings_battles = -1
+        self._conn = None
+        self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="vote-db")
+        self._flush_event = asyncio.Event()
+        self._tasks = []
+
+    def record(self, model_a: str, model_b: str, vote_option: str):
+        outcome, _ = VOTE_OUTCOMES[vote_option]
+        self.pending.append((time.time(), model_a, model_b, outcome))
+        # 배치가 차면 주기를 기다리지 않고 바로 기록
+        if len(self.pending) >= VOTE_BATCH_SIZE:
+            self._flush_event.set()
+
+    # --- DB (전용 스레드에서만 호출) ---
+    def _connect(self):
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS votes ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, created_at REAL NOT NULL, "
+            "model_a TEXT NOT NULL, model_b TEXT NOT NULL, outcome TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    def _write(self, rows):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO votes (created_at, model_a, model_b, outcome) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def _read_since(self, last_id, limit=10000):
+        return self._conn.execute(
+            "SELECT id, model_a, model_b, outcome FROM votes WHERE id > ? ORDER BY id LIMIT ?",
+            (last_id, limit),
+        ).fetchall()
+
+    async def _db(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._db_executor, func, *args)
+
+    # --- 증분 집계 ---
+    def _apply(self, model_a, model_b, outcome):
+        for m in (model_a, model_b):
+            if m not in self.counts:
+                self.models.append(m)
+                self.counts[m] = 0
+                self.elo[m] = float(ELO_INIT)
+
+        if outcome == "A":
+            self.counts[model_a] += 1
+        elif outcome == "B":
+            self.counts[model_b] += 1
+        elif outcome == "tie":
+            self.counts["Tie"] += 1
+        else:
+            self.counts["Both Bad"] += 1
+
+        score_a = OUTCOME_SCORES[outcome]
+        expected_a = 1 / (1 + 10 ** ((self.elo[model_b] - self.elo[model_a]) / 400))
+        self.elo[model_a] += ELO_K * (score_a - expected_a)
+        self.elo[model_b] -= ELO_K * (score_a - expected_a)
+
+        # BT 적합용 쌍별 승점 (키는 정렬된 쌍)
+        a, b = sorted((model_a, model_b))
+        if a != model_a:
+            score_a = 1 - score_a
+        score_a_total, score_b_total = self.pair_scores.get((a, b), (0.0, 0.0))
+        self.pair_scores[(a, b)] = (score_a_total + score_a, score_b_total + 1 - score_a)
+        self.battles += 1
+
+    async def sync(self):
+        # 대기 중인 투표를 한 트랜잭션으로 기록하고, 새로 커밋된 행(다른 워커 포함)을 집계에 반영
+        if self.pending:
+            rows, self.pending = self.pending, []
+            try:
+                await self._db(self._write, rows)
+            except Exception:
+                self.pending = rows + self.pending
+                raise
+
+        changed = False
+        while True:
+            rows = await self._db(self._read_since, self.last_id)
+            if not rows:
+                break
+            for row_id, model_a, model_b, outcome in rows:
+                self._apply(model_a, model_b, outcome)
+                self.last_id = row_id
+            changed = True
+        if changed:
+            self.snapshot = dict(self.counts)
+
+    async def refresh_ratings(self):
+        if self._ratings_battles == self.battles:
+            return
+        battles, pair_scores, models = self.battles, dict(self.pair_scores), list(self.models)
+        loop = asyncio.get_running_loop()
+        bradley_terry = await loop.run_in_executor(None, bootstrap_ratings, pair_scores, models)
+        self.ratings = {
+            "battles": battles,
+            "elo": {m: round(r, 1) for m, r in self.elo.items()},
+            "bradley_terry": bradley_terry,
+            "updated_at": time.time(),
+        }
+        self._ratings_battles = battles
+
+    async def _flush_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_event.wait(), timeout=VOTE_FLUSH_MS / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_event.clear()
+            try:
+                await self.sync()
+            except Exception as e:
+                print(f"❌ 투표 저장 실패: {e}")
+
+    async def _ratings_loop(self):
+        while True:
+            try:
+                await self.refresh_ratings()
+            except Exception as e:
+                print(f"❌ 레이팅 계산 실패: {e}")
+            await asyncio.sleep(RATINGS_REFRESH_SEC)
+
+    async def start(self):
+        await self._db(self._connect)
+        await self.sync()
+        self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._ratings_loop())]
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await self.sync()
+        await self._db(self._conn.close)
@@ -17,6 +17,54 @@ const patients = [
   { id: 9, name: "환자 10" },
 ];
 
+// /compare/stream 의 SSE 이벤트를 읽어 슬롯(A/B)별로 응답을 점진적으로 렌더링
+async function streamCompare(body, order, setResponse) {
+  const res = await fetch('http://localhost:8000/compare/stream', {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify(body)
+  });
+  if (!res.ok || !res.body) {
+    throw new Error(`HTTP ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  const started = new Set();
+  let buffer = '';
+
+  const handleEvent = (event, data) => {
+    const key = order['ABCDEFGHIJKLMNOPQRSTUVWXYZ'.indexOf(data.slot)];
+    if (event === 'token') {
+      const first = !started.has(key);
+      started.add(key);
+      setResponse(prev => ({ ...prev, [key]: (first ? '' : prev[key]) + data.text }));
+    } else if (event === 'error') {
+      setResponse(prev => ({ ...prev, [key]: data.message }));
+    }
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const chunk = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of chunk.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      if (data) handleEvent(event, JSON.parse(data));
+    }
+  }
+}
+
 function App() {
   const [message, setMessage] = useState('');
   const [isAutoMessage, setIsAutoMessage] = useState(false);
@@ -134,18 +182,11 @@ const navigate = useNavigate();
           setResponse({ openpsi: '응답 대기 중...', gpt4o: '응답 대기 중...' });
 
           try {
-            const res = await fetch('http://localhost:8000/compare', {
-              method: 'POST',
-              headers: { 'Content-Type': 'application/json' },
-              body: JSON.stringify({
-                message: autoMessage,
-                model_order: shuffled,
-                patient_id: selectedPatientId
-              })
-            });
-
-            const data = await res.json();
-            setResponse(data);
+            await streamCompare({
+              message: autoMessage,
+              model_order: shuffled,
+              patient_id: selectedPatientId
+            }, shuffled, setResponse);
           } catch (error) {
             setResponse({
               openpsi: '[에러] 응답을 가져오지 못했습니다.',
@@ -182,19 +223,12 @@ const navigate = useNavigate();
     setResponse({ openpsi: '응답 대기 중...', gpt4o: '응답 대기 중...' });
 
     try {
-      const res = await fetch('http://localhost:8000/compare', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-          message,
-          model_order: shuffled,
-          patient_id: selectedPatientId,
-          ...(selectedPatientId === -1 ? { custom_patient_data: customPatientData } : {})
-        })
-      });
-
-      const data = await res.json();
-      setResponse(data);
+      await streamCompare({
+        message,
+        model_order: shuffled,
+        patient_id: selectedPatientId,
+        ...(selectedPatientId === -1 ? { custom_patient_data: customPatientData } : {})
+      }, shuffled, setResponse);
     } catch (error) {
       setResponse({
         openpsi: '[에러] 응답을 가져오지 못했습니다.',
@@ -1,30 +1,21 @@
 import os
+import sys
 import json
+import textwrap
 import random
 import time
-import openai
-from dotenv import load_dotenv
+import asyncio
+from pathlib import Path
 from typing import Dict, List
 
-load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
-
-# 고정 카테고리
-CORE_BELIEF_CATEGORIES = {
-    "helpless": [
-        "I am incompetent", "I am helpless", "I am powerless, weak, vulnerable",
-        "I am a victim", "I am needy", "I am trapped", "I am out of control",
-        "I am a failure, loser", "I am defective"
-    ],
-    "unlovable": [
-        "I am unlovable", "I am unattractive", "I am undesirable, unwanted",
-        "I am bound to be rejected", "I am bound to be abandoned", "I am bound to be alone"
-    ],
-    "worthless": [
-        "I am worthless, waste", "I am immoral", "I am bad - dangerous, toxic, evil"
-    ]
-}
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from llm.client import AsyncLLMClient
+from data.patient_store import CORE_BELIEF_CATEGORIES
 
+# 동시에 생성 중인 환자 수 (요청 동시성/속도 제한은 AsyncLLMClient가 담당)
+PATIENT_CONCURRENCY = 32
+
+# 고정 카테고리 (core belief 범주는 환자 저장소의 범주 인덱스와 공유)
 EMOTIONS = [
     "anxious", "sad", "angry", "hurt", "ashamed", "guilty",
     "jealous", "disappointed", "suspicious"
@@ -59,7 +50,7 @@ def validate_ccd_fields(ccd: Dict) -> Dict:
             ccd[key] = default
     return ccd
 
-def get_valid_styles(core_belief: str) -> List[str]:
+def get_valid_styles(core_belief: str, rng: random.Random = random) -> List[str]:
     if "failure" in core_belief or "incompetent" in core_belief:
         return ["reserved", "plain"]
     elif "unlovable" in core_belief or "rejected" in core_belief:
@@ -67,27 +58,28 @@ def get_valid_styles(core_belief: str) -> List[str]:
     elif "worthless" in core_belief or "immoral" in core_belief:
         return ["upset", "reserved"]
     else:
-        return random.sample(CONVERSATIONAL_STYLES, 2)
+        return rng.sample(CONVERSATIONAL_STYLES, 2)
 
-def generate_situation(situation_type: str) -> str:
+async def generate_situation(client: AsyncLLMClient, situation_type: str, sample: int = 0) -> str:
     system_prompt = (
         "You are a CBT expert. Generate a realistic, 1-2 sentence situation involving the following domain that could activate a negative core belief. "
         "Keep it natural and specific, as if writing a case summary."
     )
     user_prompt = f"Domain: {situation_type}"
 
-    response = openai.ChatCompletion.create(
+    response = await client.chat(
         model="gpt-4-turbo",
         temperature=0.7,
+        sample=sample,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
     )
-    return response.choices[0].message.content.strip()
+    return response.strip()
 
 # GPT 호출: CCD 생성
-def generate_ccd_fields(core_belief: str, situation: str, forced_styles: List[str]) -> Dict:
+async def generate_ccd_fields(client: AsyncLLMClient, core_belief: str, situation: str, forced_styles: List[str], sample: int = 0) -> Dict:
     system_prompt = (
         "You are a CBT expert. Based on the given core belief and situation, generate a cognitive conceptualization diagram (CCD) as JSON with the following fields:\n"
         "- intermediate_beliefs: string\n"
@@ -102,50 +94,58 @@ def generate_ccd_fields(core_belief: str, situation: str, forced_styles: List[st
 
     user_prompt = f'Core belief: "{core_belief}"\nSituation: "{situation}"'
 
-    response = openai.ChatCompletion.create(
+    response = await client.chat(
         model="gpt-4-turbo",
         temperature=0.7,
+        sample=sample,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
     )
-    return safe_extract_json(response.choices[0].message.content)
+    return safe_extract_json(response)
 
 # GPT 호출: relevant_history 생성
-def generate_relevant_history(core_belief: str) -> str:
+async def generate_relevant_history(client: AsyncLLMClient, core_belief: str, sample: int = 0) -> str:
     system_prompt = (
         "Generate a realistic 2-3 sentence relevant history for a patient who developed the following core belief. "
         "Include family background or early environment. Keep it causal and natural."
     )
     user_prompt = f'Core belief: "{core_belief}"'
 
-    response = openai.ChatCompletion.create(
+    response = await client.chat(
         model="gpt-4-turbo",
         temperature=0.7,
+        sample=sample,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_prompt}
         ]
     )
-    return response.choices[0].message.content.strip()
+    return response.strip()
 
 # 환자 모델 생성
-def generate_patient_model(patient_id: int) -> Dict:
-    belief_group = random.choice(list(CORE_BELIEF_CATEGORIES.keys()))
-    core_belief = random.choice(CORE_BELIEF_CATEGORIES[belief_group])
-    situation_type = random.choice(SITUATIONS)
-    situation = generate_situation(situation_type)
-
-    forced_styles = get_valid_styles(core_belief)
-    relevant_history = generate_relevant_history(core_belief)
-    ccd_raw = generate_ccd_fields(core_belief, situation, forced_styles)
+async def generate_patient_model(client: AsyncLLMClient, patient_id: int) -> Dict:
+    # 환자 ID로 시드를 고정해 완료 순서/재실행과 무관하게 같은 선택(→ 같은 프롬프트, LLM 캐시 적중)이 나오게 함
+    rng = random.Random(patient_id)
+    belief_group = rng.choice(list(CORE_BELIEF_CATEGORIES.keys()))
+    core_belief = rng.choice(CORE_BELIEF_CATEGORIES[belief_group])
+    situation_type = rng.choice(SITUATIONS)
+    forced_styles = get_valid_styles(core_belief, rng)
+
+    # situation과 relevant_history는 서로 독립이므로 동시에 요청. CCD는 situation이 필요
+    situation, relevant_history = await asyncio.gather(
+        generate_situation(client, situation_type, sample=patient_id),
+        generate_relevant_history(client, core_belief, sample=patient_id),
+    )
+    ccd_raw = await generate_ccd_fields(client, core_belief, situation, forced_styles, sample=patient_id)
     ccd = validate_ccd_fields(ccd_raw)
 
     return {
         "id": patient_id,
         "relevant_history": relevant_history,
         "situation": situation,
+        "situation_type": situation_type,
         "core_beliefs": [core_belief],
         "intermediate_beliefs": ccd.get("intermediate_beliefs", ""),
         "intermediate_beliefs_depressed": ccd.get("intermediate_beliefs_depressed", ""),
@@ -156,29 +156,144 @@ def generate_patient_model(patient_id: int) -> Dict:
         "conversational_styles": ccd.get("conversational_styles", forced_styles)
     }
 
-# 전체 생성
-def generate_dataset(n: int, start_id: int = 1) -> List[Dict]:
-    dataset = []
+class ProgressLog:
+    # 완료된 환자를 JSONL에 한 줄씩 추가하고, 기록이 디스크에 닿은 뒤에만 인덱스(id, offset, length)를 fsync로 남김
+    # 인덱스에 없는 JSONL 꼬리(기록 도중 죽은 줄)와 덜 써진 인덱스 줄은 재시작 시 잘라냄
+    def __init__(self, output_file: str):
+        self.output_file = output_file
+        self.index_file = output_file + ".idx"
+        self.entries = {}
+        # 인덱스가 없거나, JSONL 없이 인덱스만 남았거나, 인덱스가 JSONL과 맞지 않으면 JSONL에서 다시 만듦
+        if not os.path.exists(self.index_file) or not self._load_index():
+            self._rebuild_index()
+            self._load_index()
+        end = max((offset + length for offset, length in self.entries.values()), default=0)
+        with open(self.output_file, "ab") as f:
+            f.truncate(end)
+        self.data = open(self.output_file, "ab")
+        self.index = open(self.index_file, "a", encoding="utf-8")
+
+    def _load_index(self) -> bool:
+        # 줄바꿈으로 끝난 인덱스 줄만 읽고, 각 항목이 JSONL의 같은 id 줄을 가리키는지 확인
+        self.entries = {}
+        if not os.path.exists(self.output_file):
+            return False
+        size = os.path.getsize(self.output_file)
+        valid_end = 0
+        with open(self.index_file, "rb") as idx, open(self.output_file, "rb") as src:
+            for line in idx:
+                if not line.endswith(b"\n"):
+                    break  # 마지막 줄이 덜 써진 경우
+                try:
+                    patient_id, offset, length = map(int, line.split())
+                    if offset + length > size:
+                        return False
+                    src.seek(offset)
+                    record = src.read(length)
+                    if not record.endswith(b"\n") or json.loads(record)["id"] != patient_id:
+                        return False
+                except (ValueError, KeyError, TypeError):
+                    return False
+                self.entries[patient_id] = (offset, length)
+                valid_end += len(line)
+        # 덜 써진 꼬리를 남겨 두면 다음 append가 그 뒤에 이어 붙어 한 줄이 깨지므로 잘라냄
+        with open(self.index_file, "r+b") as idx:
+            idx.truncate(valid_end)
+        return True
+
+    def _rebuild_index(self):
+        # JSONL에서 끝까지 온전한 줄만 인덱스로 복구 (JSONL이 없으면 빈 인덱스)
+        offset = 0
+        with open(self.index_file, "w", encoding="utf-8") as idx:
+            if not os.path.exists(self.output_file):
+                return
+            with open(self.output_file, "rb") as src:
+                for line in src:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError
+                        patient_id = json.loads(line)["id"]
+                    except (ValueError, KeyError):
+                        break
+                    idx.write(f"{patient_id} {offset} {len(line)}\n")
+                    offset += len(line)
+
+    def append(self, patient: Dict):
+        line = (json.dumps(patient, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self.data.tell()
+        self.data.write(line)
+        self.data.flush()
+        os.fsync(self.data.fileno())
+        self.index.write(f"{patient['id']} {offset} {len(line)}\n")
+        self.index.flush()
+        os.fsync(self.index.fileno())
+        self.entries[patient["id"]] = (offset, len(line))
+
+    def close(self):
+        self.data.close()
+        self.index.close()
+
+
+# 전체 생성: 여러 환자를 동시에 생성하고, 끝나는 대로 JSONL에 기록. 이미 기록된 ID는 건너뜀
+async def generate_dataset_async(n: int, start_id: int = 1, output_file: str = "patient_psi_validset.jsonl",
+                                 client: AsyncLLMClient = None, patient_concurrency: int = PATIENT_CONCURRENCY) -> int:
+    client = client or AsyncLLMClient()
+    log = ProgressLog(output_file)
+    pending = iter([pid for pid in range(start_id, start_id + n) if pid not in log.entries])
+    todo = n - sum(1 for pid in range(start_id, start_id + n) if pid in log.entries)
+    if todo < n:
+        print(f"⏩ 이미 생성된 환자 {n - todo}명은 건너뜀 ({output_file})")
     start_time = time.time()
-    for i in range(n):
-        elapsed = time.time() - start_time
-        avg_time = elapsed / (i + 1)
-        remaining = avg_time * (n - i - 1)
-        print(f"🧠 Generating patient {start_id + i}... ⏱️ 약 {remaining:.1f}초 남음")
-        try:
-            patient = generate_patient_model(start_id + i)
-            dataset.append(patient)
-        except Exception as e:
-            print(f"❌ Error for patient {start_id + i}: {e}")
-    return dataset
-
-# 저장
-def save_to_json(data: List[Dict], filename="patient_psi_validset.json"):
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-# 실행
+    done = 0
+
+    # 고정된 수의 워커가 ID를 하나씩 가져가므로 메모리 사용량은 n과 무관
+    async def worker():
+        nonlocal done
+        for patient_id in pending:
+            try:
+                patient = await generate_patient_model(client, patient_id)
+            except Exception as e:
+                print(f"❌ Error for patient {patient_id}: {e}")
+                continue
+            log.append(patient)
+            done += 1
+            remaining = (time.time() - start_time) / done * (todo - done)
+            print(f"🧠 Patient {patient_id} 완료 ({done}/{todo}) ⏱️ 약 {remaining:.1f}초 남음")
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(min(patient_concurrency, max(todo, 1)))))
+    finally:
+        log.close()
+        await client.aclose()
+    print(f"📊 요청 {client.requests}회, 재시도 {client.retries}회, {time.time() - start_time:.1f}초")
+    if client.cache is not None:
+        client.cache.print_stats()
+    return done
+
+
+def generate_dataset(n: int, start_id: int = 1, output_file: str = "patient_psi_validset.jsonl") -> int:
+    return asyncio.run(generate_dataset_async(n, start_id, output_file))
+
+
+# 압축: 인덱스를 ID 순으로 읽어 최종 JSON 배열로 저장 (한 번에 한 환자만 메모리에 올림)
+def compact_to_json(output_file: str = "patient_psi_validset.jsonl", filename: str = "patient_psi_validset.json") -> int:
+    log = ProgressLog(output_file)
+    log.close()
+    tmp_path = filename + ".tmp"
+    with open(output_file, "rb") as src, open(tmp_path, "w", encoding="utf-8") as dst:
+        dst.write("[")
+        for i, patient_id in enumerate(sorted(log.entries)):
+            offset, length = log.entries[patient_id]
+            src.seek(offset)
+            patient = json.loads(src.read(length))
+            # json.dump(data, indent=2)와 같은 형식
+            dst.write(("," if i else "") + "\n" + textwrap.indent(json.dumps(patient, indent=2, ensure_ascii=False), "  "))
+        dst.write("\n]" if log.entries else "]")
+    os.replace(tmp_path, filename)
+    return len(log.entries)
+
+# 실행 (중간에 중단돼도 다시 실행하면 남은 환자만 생성)
 if __name__ == "__main__":
-    dataset = generate_dataset(100, start_id=1001)
-    save_to_json(dataset)
-    print(f"✅ {len(dataset)}개 샘플 생성 완료 (저장됨)")
+    generate_dataset(100, start_id=1001)
+    count = compact_to_json()
+    print(f"✅ {count}개 샘플 생성 완료 (저장됨)")
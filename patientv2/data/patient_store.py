@@ -0,0 +1,200 @@
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+
+# 환자 프로필 저장소 (SQLite). JSON 배열/JSONL 환자 파일을 한 번 변환해 두면
+# 전체 파일을 파싱하지 않고 id, 파일 내 위치, core belief(범주), 대화 스타일, 상황 유형으로 바로 조회
+#   python data/patient_store.py data/patient_psi_trainset.json            # → data/patient_psi_trainset.db
+#   python data/patient_store.py data/patient_psi_trainset.json --style reserved --category helpless
+PATIENT_DB_MMAP_BYTES = int(os.getenv("PATIENT_DB_MMAP_BYTES", str(256 * 1024 * 1024)))
+
+# core belief 범주 (data_generation.py가 환자를 만들 때 사용하는 고정 카테고리)
+CORE_BELIEF_CATEGORIES = {
+    "helpless": [
+        "I am incompetent", "I am helpless", "I am powerless, weak, vulnerable",
+        "I am a victim", "I am needy", "I am trapped", "I am out of control",
+        "I am a failure, loser", "I am defective"
+    ],
+    "unlovable": [
+        "I am unlovable", "I am unattractive", "I am undesirable, unwanted",
+        "I am bound to be rejected", "I am bound to be abandoned", "I am bound to be alone"
+    ],
+    "worthless": [
+        "I am worthless, waste", "I am immoral", "I am bad - dangerous, toxic, evil"
+    ]
+}
+BELIEF_TO_CATEGORY = {belief: category for category, beliefs in CORE_BELIEF_CATEGORIES.items() for belief in beliefs}
+
+# 조회 인자 → patient_tags.kind
+TAG_KINDS = {
+    "core_belief": "core_belief",
+    "core_belief_category": "core_belief_category",
+    "conversational_style": "conversational_style",
+    "situation_type": "situation_type",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS patients (position INTEGER PRIMARY KEY, id INTEGER, data TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS patients_id ON patients (id);
+CREATE TABLE IF NOT EXISTS patient_tags (kind TEXT NOT NULL, value TEXT NOT NULL, position INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS patient_tags_lookup ON patient_tags (kind, value, position);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+def patient_tags(patient):
+    # 환자 한 명의 (kind, value) 목록. situation_type은 data_generation.py가 기록한 환자에만 있음
+    tags = []
+    for belief in patient.get("core_beliefs", []):
+        tags.append(("core_belief", belief))
+        if belief in BELIEF_TO_CATEGORY:
+            tags.append(("core_belief_category", BELIEF_TO_CATEGORY[belief]))
+    for style in patient.get("conversational_styles", []):
+        tags.append(("conversational_style", style))
+    if patient.get("situation_type"):
+        tags.append(("situation_type", patient["situation_type"]))
+    return sorted(set(tags))
+
+
+def iter_source(path):
+    # JSON 배열 또는 JSONL (data_generation.py의 진행 파일) 환자 파일
+    with open(path, "r", encoding="utf-8") as f:
+        if str(path).endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)
+
+
+def source_signature(path):
+    stat = os.stat(path)
+    return json.dumps({"path": str(Path(path).resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns})
+
+
+def build_store(source_path, db_path):
+    # 임시 DB에 모두 쓴 뒤 교체 → 읽는 쪽은 항상 완성된 DB만 봄
+    tmp_path = f"{db_path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    conn.executescript(SCHEMA)
+    count = 0
+    for position, patient in enumerate(iter_source(source_path)):
+        conn.execute("INSERT INTO patients (position, id, data) VALUES (?, ?, ?)",
+                     (position, patient.get("id"), json.dumps(patient, ensure_ascii=False)))
+        conn.executemany("INSERT INTO patient_tags (kind, value, position) VALUES (?, ?, ?)",
+                         [(kind, value, position) for kind, value in patient_tags(patient)])
+        count += 1
+    conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)",
+                     [("source", source_signature(source_path)), ("count", str(count))])
+    conn.commit()
+    conn.close()
+    os.replace(tmp_path, db_path)
+    return count
+
+
+class PatientStore:
+    # 읽기 전용 조회. 연결 하나를 lock으로 공유 (FastAPI 워커 스레드/스크립트 공용)
+    def __init__(self, db_path):
+        self.db_path = str(db_path)
+        self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.execute(f"PRAGMA mmap_size={PATIENT_DB_MMAP_BYTES}")
+        self._lock = threading.Lock()
+
+    @classmethod
+    def open(cls, db_path, source_path=None):
+        # source_path가 주어지면 DB가 없거나 원본 파일이 바뀌었을 때만 다시 만듦 (stat 비교만 하므로 기동은 O(1))
+        if source_path is not None and cls.is_stale(db_path, source_path):
+            print(f"🗂️ 환자 저장소 생성: {source_path} → {db_path}")
+            count = build_store(source_path, db_path)
+            print(f"   환자 {count}명")
+        return cls(db_path)
+
+    @staticmethod
+    def is_stale(db_path, source_path):
+        if not os.path.exists(db_path):
+            return True
+        try:
+            conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            row = conn.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+            conn.close()
+        except sqlite3.DatabaseError:
+            return True
+        return row is None or row[0] != source_signature(source_path)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def __len__(self):
+        return self._query("SELECT COUNT(*) FROM patients")[0][0]
+
+    def get(self, patient_id):
+        # 환자 id(파일의 "id" 필드)로 조회. 없으면 None
+        rows = self._query("SELECT data FROM patients WHERE id = ? ORDER BY position LIMIT 1", (patient_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def at(self, position):
+        # 원본 파일에서의 위치(0부터)로 조회. 없으면 None
+        rows = self._query("SELECT data FROM patients WHERE position = ?", (position,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def positions(self, limit=None, offset=0, **filters):
+        # 필터(core_belief, core_belief_category, conversational_style, situation_type)를 모두 만족하는 위치 목록
+        # 필터마다 (kind, value, position) 인덱스를 타고 교집합을 SQLite가 계산
+        clauses, params = [], []
+        for key, value in filters.items():
+            if value is None:
+                continue
+            if key not in TAG_KINDS:
+                raise ValueError(f"Unknown patient filter: {key}")
+            clauses.append("SELECT position FROM patient_tags WHERE kind = ? AND value = ?")
+            params += [TAG_KINDS[key], value]
+        sql = " INTERSECT ".join(clauses) if clauses else "SELECT position FROM patients"
+        sql = f"SELECT position FROM ({sql}) ORDER BY position LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else limit, offset]
+        return [row[0] for row in self._query(sql, params)]
+
+    def find(self, limit=None, offset=0, **filters):
+        # 필터를 만족하는 환자를 위치 순서대로 (한 번에 한 명씩 읽음)
+        for position in self.positions(limit, offset, **filters):
+            yield self.at(position)
+
+    def values(self, kind):
+        # 조회 가능한 값과 환자 수 (예: values("conversational_style") → {"reserved": 120, ...})
+        rows = self._query("SELECT value, COUNT(*) FROM patient_tags WHERE kind = ? GROUP BY value ORDER BY value", (TAG_KINDS[kind],))
+        return dict(rows)
+
+    def close(self):
+        self._conn.close()
+
+
+def default_db_path(source_path):
+    return str(Path(source_path).with_suffix(".db"))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source")
+    parser.add_argument("--db", default=None)
+    parser.add_argument("--core-belief", default=None)
+    parser.add_argument("--category", default=None)
+    parser.add_argument("--style", default=None)
+    parser.add_argument("--situation-type", default=None)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    store = PatientStore.open(args.db or default_db_path(args.source), args.source)
+    print(f"환자 {len(store)}명")
+    for kind in TAG_KINDS:
+        print(f"  {kind}: {store.values(kind)}")
+    filters = dict(core_belief=args.core_belief, core_belief_category=args.category,
+                   conversational_style=args.style, situation_type=args.situation_type)
+    if any(v is not None for v in filters.values()):
+        positions = store.positions(**filters)
+        print(f"조건에 맞는 환자 {len(positions)}명: 위치 {positions[:args.limit]}")
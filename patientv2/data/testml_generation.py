@@ -1,30 +1,29 @@
-import openai
 import json
+import sys
 import time
+from pathlib import Path
 from typing import Optional
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data.patient_store import PatientStore, default_db_path
+from data.prompts import PROMPT_LAYOUT, build_prompt, stringify
+from llm.cache import cached_chat_completion
+
 # 입력 및 출력 경로
 INPUT_PATH = "data/patient_psi_validset.json"
-OUTPUT_PATH = "data/patient_psi_validml.jsonl"
+OUTPUT_PATH = "data/patient_psi_validml_prefix.jsonl" if PROMPT_LAYOUT == "prefix_first" else "data/patient_psi_validml.jsonl"
 MAX_COUNT = 1000  # e.g., set to 100 to only process first 100 samples
-
-# 리스트 또는 문자열을 안전하게 문자열로 변환
-def stringify(value):
-    if isinstance(value, list):
-        return ", ".join(value)
-    return value.strip() if isinstance(value, str) else str(value)
+# 환자 저장소 조회 조건 (예: {"core_belief_category": "helpless", "conversational_style": "reserved"}). 비우면 전체
+PATIENT_FILTERS = {}
 
 def generate_assistant_response(prompt, model="gpt-4.1-mini", temperature=0.7):
     messages = [
         {"role": "system", "content": "You are a simulated patient in a CBT session."},
         {"role": "user", "content": prompt}
     ]
-    response = openai.ChatCompletion.create(
-        model=model,
-        messages=messages,
-        temperature=temperature
-    )
-    return response["choices"][0]["message"]["content"].strip()
+    # 같은 프롬프트는 LLM 캐시(llm/cache.py)에서 재사용
+    response = cached_chat_completion(messages, model=model, temperature=temperature)
+    return response.strip()
 
 def evaluate_response(prompt: str, model_response: str, reference: Optional[str] = None):
     # TODO: Replace with GPT-4.1-mini or other evaluator API
@@ -38,99 +37,9 @@ def evaluate_response(prompt: str, model_response: str, reference: Optional[str]
 
 # ChatML 형식으로 변환
 def convert_to_chatml(sample):
-    history = stringify(sample.get("relevant_history", ""))
-    core_beliefs = stringify(sample.get("core_beliefs", []))
-    intermediate_beliefs = stringify(sample.get("intermediate_beliefs", ""))
-    intermediate_depression = stringify(sample.get("intermediate_beliefs_depressed", ""))
-    coping_strategies = stringify(sample.get("coping_strategies", ""))
-    situation = stringify(sample.get("situation", ""))
-    automatic_thoughts = stringify(sample.get("automatic_thoughts", []))
-    emotions = stringify(sample.get("emotions", []))
-    behaviors = stringify(sample.get("behaviors", []))
-    style_list = sample.get("conversational_styles", [])
-    STYLE_DESCRIPTION_MAP = {
-        "plain": "The patient communicates in a direct, straightforward manner.",
-        "upset": "An upset patient may 1) exhibit anger or resistance towards the therapist or the therapeutic process, 2) may be challenging or dismissive of the therapist’s suggestions and interventions, 3) have difficulty trusting the therapist and forming a therapeutic alliance, and 4) be prone to arguing, criticizing, or expressing frustration during therapy sessions.",
-        "verbose": "A verbose patient may 1) provide detailed responses to questions, even if directly relevant, 2) elaborate on personal experiences, thoughts, and feelings extensively, and 3) demonstrate difficulty in allowing the therapist to guide the conversation.",
-        "reserved": "A reserved patient may 1) provide brief, vague, or evasive answers to questions, 2) demonstrate reluctance to share personal information or feelings, 3) require more prompting and encouragement to open up, and 4) express distrust or skepticism towards the therapist.",
-        "tangent": "A patient who goes off on tangent may 1) start answering a question but quickly veer off into unrelated topics, 2) share personal anecdotes or experiences that are not relevant to the question asked, 3) demonstrate difficulty staying focused on the topic at hand, and 4) require redirection to bring the conversation back to the relevant points.",
-        "pleasing": "A pleasing patient may 1) minimize or downplay your own concerns or symptoms to maintain a positive image, 2) demonstrate eager-to-please behavior and avoid expressing disagreement or dissatisfaction, 3) seek approval or validation from the therapist frequently, and 4) agree with the therapist’s statements or suggestions readily, even if they may not fully understand or agree."
-    }
-    style_descriptions = [STYLE_DESCRIPTION_MAP.get(s, "") for s in style_list if s in STYLE_DESCRIPTION_MAP]
-    style_description = "\n".join(f"{i+1}. {desc}" for i, desc in enumerate(style_descriptions))
+    prompt = build_prompt(sample, PROMPT_LAYOUT)
     response = stringify(sample.get("response", ""))
 
-    prompt = f"""Imagine you are XXX, a patient who has been
-    experiencing mental health challenges. You have
-    been attending therapy sessions for several weeks.
-    Your task is to engage in a conversation with
-    the therapist as XXX would during a cognitive
-    behavioral therapy (CBT) session. Align your
-    responses with XXX’s background information
-    provided in the ‘Relevant history’ section. Your
-    thought process should be guided by the cognitive
-    conceptualization diagram in the ‘Cognitive
-    Conceptualization Diagram’ section, but avoid
-    directly referencing the diagram as a real patient
-    would not explicitly think in those terms.
-
-    Patient History: {history}
-
-    Cognitive Conceptualization Diagram:
-    Core Beliefs: {core_beliefs}
-    Intermediate Beliefs: {intermediate_beliefs}
-    Intermediate Beliefs during Depression: {intermediate_depression}
-    Coping Strategies: {coping_strategies}
-
-    You will be asked about your experiences
-    over the past week. Engage in a conversation with
-    the therapist regarding the following situation
-    and behavior. Use the provided emotions and
-    automatic thoughts as a reference, but do not
-    disclose the cognitive conceptualization diagram
-    directly. Instead, allow your responses to be
-    informed by the diagram, enabling the therapist
-    to infer your thought processes.
-
-    Situation: {situation}
-    Automatic thoughts: {automatic_thoughts}
-    Emotions: {emotions}
-    Behaviors: {behaviors}
-
-    In the upcoming conversation, you will simulate
-    XXX during the therapy session, while the user
-    will play the role of the therapist. Adhere
-    to the following guidelines:
-    {style_description}
-    2. Emulate the demeanor and responses of a genuine patient
-    to ensure authenticity in your interactions. Use
-    natural language, including hesitations, pauses,
-    and emotional expressions, to enhance the realism
-    of your responses.
-    3. Gradually reveal deeper concerns and core issues, as a real patient often
-    requires extensive dialogue before delving into
-    more sensitive topics. This gradual revelation
-    creates challenges for therapists in identifying
-    the patient’s true thoughts and emotions.
-    4. Maintain consistency with XXX’s profile
-    throughout the conversation. Ensure that your
-    responses align with the provided background
-    information, cognitive conceptualization diagram,
-    and the specific situation, thoughts, emotions,
-    and behaviors described.
-    5. Engage in a dynamic
-    and interactive conversation with the therapist.
-    Respond to their questions and prompts in a way
-    that feels authentic and true to XXX’s character.
-    Allow the conversation to flow naturally, and avoid
-    providing abrupt or disconnected responses.
-
-    You are now XXX. Respond to the therapist’s prompts
-    as XXX would, regardless of the specific questions
-    asked. Limit each of your responses to a maximum
-    of 5 sentences."""
-
-
     return {
         "messages": [
             {"role": "system", "content": "You are a simulated patient in a CBT session."},
@@ -141,15 +50,15 @@ def convert_to_chatml(sample):
 
 # 메인 변환 로직
 def main():
-    with open(INPUT_PATH, "r") as f:
-        data = json.load(f)
+    # 환자 저장소(data/patient_store.py)에서 조건에 맞는 환자만 한 명씩 읽음. 원본 JSON이 바뀌었을 때만 저장소를 다시 만듦
+    store = PatientStore.open(default_db_path(INPUT_PATH), INPUT_PATH)
+    positions = store.positions(limit=MAX_COUNT, **PATIENT_FILTERS)
 
     start_time = time.time()
-    total = len(data) if MAX_COUNT is None else min(len(data), MAX_COUNT)
+    total = len(positions)
     with open(OUTPUT_PATH, "w") as out_f:
-        for idx, sample in enumerate(data):
-            if MAX_COUNT is not None and idx >= MAX_COUNT:
-                break
+        for idx, position in enumerate(positions):
+            sample = store.at(position)
             elapsed = time.time() - start_time
             avg_time = elapsed / (idx + 1)
             remaining = avg_time * (total - idx - 1)
@@ -1,84 +1,73 @@
+import asyncio
 import json
-import openai
-from tqdm import tqdm
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-import os
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from llm.cache import llm_cache
+from judge import PairwiseJudge, Tournament
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # 설정
 EVAL_MODEL = "gpt-4.1-mini"  # GPT-4.1-mini
-NANO_RESP_FILE = "response/gpt4nano_response.jsonl"
-SFT_RESP_FILE = "response/openpsi0.5B_response.jsonl"
+# 비교할 시스템: 이름 → 응답 파일 (TEST_FILE과 같은 순서). 시스템을 추가하면 토너먼트로 비교
+SYSTEMS = {
+    "GPT-4.1-nano": "response/gpt4nano_response.jsonl",
+    "OpenPatientΨ-0.5B": "response/openpsi0.5B_response.jsonl",
+}
+# "round_robin" (모든 쌍) 또는 "swiss" (시스템이 많을 때 log2(N) 라운드)
+# swiss + OPENAI_BATCH=submit/collect: 다음 라운드 짝은 앞 라운드 결과로 정해지므로 collect 한 번에 한 라운드씩 진행
+# (collect → 앞 라운드 결과 반영 후 다음 라운드 제출 → 다시 collect ... 모든 라운드가 끝나면 결과 저장)
+TOURNAMENT = "round_robin"
+TEST_FILE = "data/patient_psi_testml.jsonl"
 OUTPUT_FILE = "evaluation/eval_results.jsonl"
-
-# 평가 프롬프트 템플릿
-SYSTEM_PROMPT = "You are a careful evaluator comparing two model responses to the same therapeutic prompt. Choose the more helpful, empathetic, and realistic patient response."
-
-EVAL_PROMPT = """\
-Compare the two responses from different models to the same therapeutic instruction.
-Your task is to judge which response is better in terms of the following criteria:
-- Emotional realism
-- Alignment with the patient's background and psychological profile
-- Appropriateness in a CBT therapy context
-
-You must reply with the better response: "A" or "B".
-Do not explain your reasoning unless asked. Just return "A" or "B".
-
-# Context (therapist prompt):
-{prompt}
-
-# Response A:
-{resp_a}
-
-# Response B:
-{resp_b}
-
-Which is better?
-"""
+SUMMARY_FILE = "evaluation/eval_summary.json"
+BATCH_STATE_FILE = "evaluation/eval_batch.json"  # OPENAI_BATCH=submit/collect 사이에 배치 id를 보관
 
 # 파일 불러오기
 def load_jsonl(path):
     with open(path, "r") as f:
         return [json.loads(line) for line in f]
 
-nano_data = load_jsonl(NANO_RESP_FILE)
-sft_data = load_jsonl(SFT_RESP_FILE)
-
-assert len(nano_data) == len(sft_data), "❌ 응답 수가 일치하지 않음"
-
-TEST_FILE = "data/patient_psi_testml.jsonl"
-test_data = load_jsonl(TEST_FILE)
-
-results = []
-
-for i in tqdm(range(len(test_data)), desc="Evaluating responses"):
-    prompt = test_data[i]["messages"][-2]["content"]
-    nano_resp = nano_data[i]["response"]
-    sft_resp = sft_data[i]["response"]
-
-    eval_input = EVAL_PROMPT.format(prompt=prompt, resp_a=nano_resp, resp_b=sft_resp)
-
-    response = openai.ChatCompletion.create(
-        model=EVAL_MODEL,
-        messages=[
-            {"role": "system", "content": SYSTEM_PROMPT},
-            {"role": "user", "content": eval_input}
-        ],
-        temperature=0,
-    )
-
-    choice = response["choices"][0]["message"]["content"].strip()
-    results.append({
-        "response_A": nano_resp,
-        "response_B": sft_resp,
-        "winner": "GPT-4.1-nano" if choice == "A" else "OpenPatientΨ-0.5B"
-    })
-
-# 저장
-with open(OUTPUT_FILE, "w") as f:
-    for r in results:
-        f.write(json.dumps(r, ensure_ascii=False) + "\n")
-
-print(f"✅ 평가 완료: {OUTPUT_FILE}")
\ No newline at end of file
+async def main():
+    test_data = load_jsonl(TEST_FILE)
+    prompts = [sample["messages"][-2]["content"] for sample in test_data]
+    systems = {name: [r["response"] for r in load_jsonl(path)] for name, path in SYSTEMS.items()}
+
+    # 각 쌍을 두 순서로 평가해 위치 편향을 상쇄. OPENAI_BATCH 설정에 따라 동시 호출 또는 Batch API
+    tournament = Tournament(systems, prompts, PairwiseJudge(model=EVAL_MODEL, state_path=BATCH_STATE_FILE))
+    finished = await (tournament.swiss() if TOURNAMENT == "swiss" else tournament.round_robin())
+    if not finished:
+        print(f"📤 배치 제출 완료. 끝나면 OPENAI_BATCH=collect로 다시 실행: {BATCH_STATE_FILE}")
+        return
+
+    # 저장 (response_A/B는 매치의 첫 번째/두 번째 시스템, winner는 시스템 이름 또는 "tie", 무효 판정은 null)
+    judged = 0
+    with open(OUTPUT_FILE, "w") as f:
+        for (x, y), records in tournament.matches.items():
+            for r in records:
+                f.write(json.dumps({
+                    "index": r["index"],
+                    "system_A": x,
+                    "system_B": y,
+                    "response_A": systems[x][r["index"]],
+                    "response_B": systems[y][r["index"]],
+                    "winner": r["winner"],
+                    "verdicts": r["raw"],
+                }, ensure_ascii=False) + "\n")
+            judged += len(records)
+    expected = len(tournament.matches) * len(prompts)
+    if judged < expected:
+        print(f"⚠️ 평가 결과를 받지 못한 요청 {expected - judged}개 (다시 실행하면 해당 요청만 재시도)")
+
+    summary = tournament.print_summary()
+    with open(SUMMARY_FILE, "w") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ 평가 완료: {OUTPUT_FILE}")
+    llm_cache.print_stats()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,278 @@
+import asyncio
+import random
+import re
+import sys
+from itertools import combinations
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from llm.batch import OPENAI_BATCH, run_requests
+from llm.client import AsyncLLMClient
+
+# 쌍대 비교(pairwise) 평가 엔진
+# - 한 쌍을 (x, y) / (y, x) 두 순서로 동시에 평가해 위치 편향을 상쇄 (두 판정이 엇갈리면 무승부)
+# - 판정 텍스트를 관대하게 파싱 ("A", "**B**", "Response A", "A." 등), 알 수 없는 판정은 무효로 분리
+# - 승/무/패 비율과 부트스트랩 신뢰구간
+# - N개 시스템은 라운드 로빈(모든 쌍) 또는 스위스 방식(비슷한 점수끼리 log2(N) 라운드)으로 비교
+EVAL_MODEL = "gpt-4.1-mini"
+BOOTSTRAP_SAMPLES = 2000
+CI_ALPHA = 0.05
+SEED = 42
+
+SYSTEM_PROMPT = "You are a careful evaluator comparing two model responses to the same therapeutic prompt. Choose the more helpful, empathetic, and realistic patient response."
+
+EVAL_PROMPT = """\
+Compare the two responses from different models to the same therapeutic instruction.
+Your task is to judge which response is better in terms of the following criteria:
+- Emotional realism
+- Alignment with the patient's background and psychological profile
+- Appropriateness in a CBT therapy context
+
+You must reply with the better response: "A" or "B".
+Do not explain your reasoning unless asked. Just return "A" or "B".
+
+# Context (therapist prompt):
+{prompt}
+
+# Response A:
+{resp_a}
+
+# Response B:
+{resp_b}
+
+Which is better?
+"""
+
+EXPLICIT_VERDICT = re.compile(r"(?i:response|answer|winner|better|choose|choice|verdict)\W*(?:(?i:is|would be)\W*)?\b([AB])\b")
+STANDALONE_LETTER = re.compile(r"\b([AB])\b")
+TIE_WORDS = re.compile(r"\b(tie|equal|equally|both|neither|same)\b", re.I)
+
+
+def parse_verdict(text):
+    # "A" / "B" / "tie" 또는 알 수 없으면 None
+    if not text:
+        return None
+    cleaned = re.sub(r"[\s*_`#\"'()\[\]:.!]+", " ", text).strip()
+    if cleaned.upper() in ("A", "B"):
+        return cleaned.upper()
+    match = EXPLICIT_VERDICT.search(text)
+    if match:
+        return match.group(1)
+    letters = set(STANDALONE_LETTER.findall(text))
+    if len(letters) == 1:
+        return letters.pop()
+    if TIE_WORDS.search(text):
+        return "tie"
+    return None
+
+
+def combine_verdicts(forward, backward):
+    # forward: x가 A 자리, backward: y가 A 자리일 때의 판정 → "x" / "y" / "tie" / None(둘 다 무효)
+    votes = []
+    if forward is not None:
+        votes.append({"A": "x", "B": "y", "tie": "tie"}[forward])
+    if backward is not None:
+        votes.append({"A": "y", "B": "x", "tie": "tie"}[backward])
+    if not votes:
+        return None
+    if len(votes) == 1 or votes[0] == votes[1]:
+        return votes[0]
+    return "tie"
+
+
+def build_judge_request(prompt, resp_a, resp_b, model=EVAL_MODEL):
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": EVAL_PROMPT.format(prompt=prompt, resp_a=resp_a, resp_b=resp_b)}
+        ],
+        "temperature": 0,
+    }
+
+
+class PairwiseJudge:
+    # jobs: [(job_id, prompt, resp_x, resp_y)] → {job_id: {"winner": "x"/"y"/"tie"/None, "raw": [정순, 역순]}}
+    # OPENAI_BATCH=off이면 AsyncLLMClient로 동시 호출 (동시성/속도 제한은 클라이언트가 담당),
+    # 그 외에는 llm/batch.py의 Batch API 경로를 사용. 어느 쪽이든 같은 판정은 LLM 캐시에서 재사용
+    def __init__(self, client=None, model=EVAL_MODEL, mode=OPENAI_BATCH, state_path="evaluation/eval_batch.json"):
+        self.client = client
+        self.model = model
+        self.mode = mode
+        self.state_path = state_path
+
+    async def _complete(self, requests):
+        if self.mode != "off":
+            return await asyncio.to_thread(run_requests, requests, self.state_path, self.mode)
+        client = self.client or AsyncLLMClient()
+
+        async def one(custom_id, payload, sample):
+            try:
+                return custom_id, await client.chat(payload["messages"], payload["model"], payload["temperature"], sample)
+            except Exception as e:
+                print(f"❌ 평가 요청 실패 ({custom_id}): {e}")
+                return custom_id, None
+
+        try:
+            done = await asyncio.gather(*(one(*r) for r in requests))
+        finally:
+            if self.client is None:
+                await client.aclose()
+        return {custom_id: text for custom_id, text in done if text is not None}
+
+    async def judge(self, jobs):
+        requests = []
+        for job_id, prompt, resp_x, resp_y in jobs:
+            requests.append((f"{job_id}-xy", build_judge_request(prompt, resp_x, resp_y, self.model), 0))
+            requests.append((f"{job_id}-yx", build_judge_request(prompt, resp_y, resp_x, self.model), 0))
+        texts = await self._complete(requests)
+        if texts is None:
+            return None  # OPENAI_BATCH=submit: 제출만 하고 종료
+
+        results = {}
+        for job_id, *_ in jobs:
+            raw = [texts.get(f"{job_id}-xy"), texts.get(f"{job_id}-yx")]
+            if raw[0] is None and raw[1] is None:
+                continue  # 응답을 받지 못한 요청은 다시 실행하면 재시도
+            results[job_id] = {"winner": combine_verdicts(parse_verdict(raw[0]), parse_verdict(raw[1])), "raw": raw}
+        return results
+
+
+def outcome_counts(outcomes):
+    counts = {"win": 0, "tie": 0, "loss": 0}
+    for o in outcomes:
+        counts[o] += 1
+    return counts
+
+
+def bootstrap_ci(outcomes, n_samples=BOOTSTRAP_SAMPLES, alpha=CI_ALPHA, seed=SEED):
+    # outcomes: "win"/"tie"/"loss" 리스트 → {win, tie, loss, score: (점추정, 하한, 상한)}. score = 승 + 0.5 * 무
+    n = len(outcomes)
+    if n == 0:
+        return {}
+    rng = random.Random(seed)
+    keys = ("win", "tie", "loss", "score")
+
+    def rates(sample):
+        c = outcome_counts(sample)
+        return {"win": c["win"] / n, "tie": c["tie"] / n, "loss": c["loss"] / n, "score": (c["win"] + 0.5 * c["tie"]) / n}
+
+    point = rates(outcomes)
+    boots = {k: [] for k in keys}
+    for _ in range(n_samples):
+        r = rates(rng.choices(outcomes, k=n))
+        for k in keys:
+            boots[k].append(r[k])
+    lo_idx = int(n_samples * alpha / 2)
+    hi_idx = min(n_samples - 1, int(n_samples * (1 - alpha / 2)))
+    ci = {}
+    for k in keys:
+        values = sorted(boots[k])
+        ci[k] = (point[k], values[lo_idx], values[hi_idx])
+    return ci
+
+
+def format_ci(ci):
+    return ", ".join(f"{k} {p:.1%} [{lo:.1%}, {hi:.1%}]" for k, (p, lo, hi) in ci.items())
+
+
+class Tournament:
+    # systems: {시스템 이름: 프롬프트 순서와 같은 응답 리스트}, prompts: 치료자 프롬프트 리스트
+    def __init__(self, systems, prompts, judge=None):
+        lengths = {len(r) for r in systems.values()}
+        assert lengths == {len(prompts)}, "❌ 시스템별 응답 수가 프롬프트 수와 일치하지 않음"
+        self.systems = systems
+        self.prompts = prompts
+        self.judge = judge or PairwiseJudge()
+        self.matches = {}  # (x, y) → [{"index", "winner"(시스템 이름/"tie"), "raw"}]
+
+    async def play(self, pairs):
+        # 여러 매치의 모든 프롬프트를 한 번에 모아 동시에 평가
+        jobs = []
+        for x, y in pairs:
+            for i, prompt in enumerate(self.prompts):
+                jobs.append((f"{x}|{y}|{i}", prompt, self.systems[x][i], self.systems[y][i]))
+        results = await self.judge.judge(jobs)
+        if results is None:
+            return False
+        for x, y in pairs:
+            records = []
+            for i in range(len(self.prompts)):
+                r = results.get(f"{x}|{y}|{i}")
+                if r is None:
+                    continue
+                winner = {"x": x, "y": y, "tie": "tie", None: None}[r["winner"]]
+                records.append({"index": i, "winner": winner, "raw": r["raw"]})
+            if records:  # 판정을 하나도 받지 못한 매치는 기록하지 않음 (만난 것으로 치지 않고 다시 실행 시 재시도)
+                self.matches[(x, y)] = records
+        return True
+
+    async def round_robin(self):
+        return await self.play(list(combinations(self.systems, 2)))
+
+    async def swiss(self, rounds=None, seed=SEED):
+        # 점수가 비슷한 시스템끼리 짝지어 (이미 만난 상대는 피함) log2(N) 라운드 진행 → N(N-1)/2 대신 약 N/2 * log2(N) 매치
+        names = list(self.systems)
+        rounds = rounds or max(1, (len(names) - 1).bit_length())
+        random.Random(seed).shuffle(names)
+        for _ in range(rounds):
+            scores = {s["system"]: s["score"] for s in self.standings()}
+            order = sorted(names, key=lambda s: -scores.get(s, 0.0))
+            pairs = []
+            while len(order) >= 2:
+                x = order.pop(0)
+                opponent = next((y for y in order if (x, y) not in self.matches and (y, x) not in self.matches), None)
+                if opponent is None:
+                    continue  # 남은 상대를 모두 만났으면 이번 라운드는 쉼
+                order.remove(opponent)
+                pairs.append((x, opponent))
+            if not pairs:
+                break
+            if not await self.play(pairs):
+                return False
+        return True
+
+    def outcomes(self, system, opponent=None):
+        # system 관점의 "win"/"tie"/"loss" 리스트 (무효 판정 제외)
+        outcomes = []
+        for (x, y), records in self.matches.items():
+            if system not in (x, y) or (opponent is not None and opponent not in (x, y)):
+                continue
+            for r in records:
+                if r["winner"] is None:
+                    continue
+                outcomes.append("tie" if r["winner"] == "tie" else "win" if r["winner"] == system else "loss")
+        return outcomes
+
+    def standings(self):
+        table = []
+        for system in self.systems:
+            outcomes = self.outcomes(system)
+            counts = outcome_counts(outcomes)
+            games = len(outcomes)
+            score = (counts["win"] + 0.5 * counts["tie"]) / games if games else 0.0
+            table.append({"system": system, "games": games, **counts, "score": score})
+        return sorted(table, key=lambda s: -s["score"])
+
+    def summary(self):
+        matches = []
+        for (x, y), records in self.matches.items():
+            outcomes = self.outcomes(x, y)
+            matches.append({
+                "system_x": x,
+                "system_y": y,
+                "judged": len(outcomes),
+                "invalid": sum(1 for r in records if r["winner"] is None),
+                "counts": outcome_counts(outcomes),
+                "ci": bootstrap_ci(outcomes),
+            })
+        return {"standings": self.standings(), "matches": matches}
+
+    def print_summary(self):
+        summary = self.summary()
+        for m in summary["matches"]:
+            print(f"⚖️ {m['system_x']} vs {m['system_y']} ({m['judged']}개, 무효 {m['invalid']}개): {format_ci(m['ci'])}")
+        print("🏆 순위")
+        for rank, s in enumerate(summary["standings"], 1):
+            print(f"  {rank}. {s['system']}: score {s['score']:.3f} (승 {s['win']} / 무 {s['tie']} / 패 {s['loss']})")
+        return summary
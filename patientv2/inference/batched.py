@@ -0,0 +1,87 @@
+import json
+import random
+import time
+
+import torch
+from tqdm import tqdm
+from transformers import StoppingCriteriaList
+
+from inference.postprocess import stop_token_ids, decode_new_tokens, MAX_SENTENCES
+from inference.stopping import TurnStoppingCriteria
+
+
+# ChatML 입력 파일 로드. 각 예제의 마지막(assistant 정답) 메시지는 제외
+# shuffle=False이면 파일 순서 유지 (정답과 인덱스로 맞춰 비교하는 검증셋용)
+def load_chatml_inputs(path, max_examples=None, seed=None, shuffle=True):
+    with open(path, "r") as f:
+        lines = f.readlines()
+    if shuffle:
+        rng = random.Random(seed) if seed is not None else random
+        rng.shuffle(lines)
+    if max_examples is not None:
+        lines = lines[:max_examples]
+    return [json.loads(line)["messages"][:-1] for line in lines]
+
+
+# 기존 스크립트와 같은 {"id", "response"} JSONL 형식으로 저장 (model_dir은 sweep writer 인터페이스용, 저장하지 않음)
+def write_responses(path, responses, model_dir=None):
+    with open(path, "w") as f:
+        for idx, r in enumerate(responses):
+            json.dump({"id": idx + 1, "response": r}, f, ensure_ascii=False)
+            f.write("\n")
+
+
+def encode_conversations(tokenizer, conversations):
+    return [
+        tokenizer.apply_chat_template(messages, add_generation_prompt=True)
+        for messages in conversations
+    ]
+
+
+def left_pad(batch_ids, pad_token_id, device):
+    max_len = max(len(ids) for ids in batch_ids)
+    input_ids = torch.full((len(batch_ids), max_len), pad_token_id, dtype=torch.long)
+    attention_mask = torch.zeros((len(batch_ids), max_len), dtype=torch.long)
+    for row, ids in enumerate(batch_ids):
+        input_ids[row, max_len - len(ids):] = torch.tensor(ids, dtype=torch.long)
+        attention_mask[row, max_len - len(ids):] = 1
+    return input_ids.to(device), attention_mask.to(device)
+
+
+# 예제를 길이순으로 정렬해 왼쪽 패딩 배치로 생성하고, 행마다 새로 생성된 토큰만 후처리(종료 시퀀스, 문장 수 제한)
+def generate_batched(model, tokenizer, conversations, batch_size=8, max_new_tokens=200, desc="Generating responses", max_sentences=MAX_SENTENCES, stop_early=True, **generate_kwargs):
+    encoded = encode_conversations(tokenizer, conversations)
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+    # 길이가 비슷한 예제끼리 묶어 패딩 낭비를 줄임 (긴 배치부터 처리해 OOM을 일찍 확인)
+    order = sorted(range(len(encoded)), key=lambda i: len(encoded[i]), reverse=True)
+    sampling = dict(do_sample=True, temperature=0.7, top_p=0.9)
+    sampling.update(generate_kwargs)
+    stop_ids = stop_token_ids(tokenizer)
+
+    results = [None] * len(encoded)
+    for start in tqdm(range(0, len(order), batch_size), desc=desc):
+        indices = order[start:start + batch_size]
+        input_ids, attention_mask = left_pad([encoded[i] for i in indices], pad_token_id, model.device)
+        if stop_early:
+            # 배치의 모든 행이 환자 턴을 끝내면 max_new_tokens 전에 멈춤
+            sampling["stopping_criteria"] = StoppingCriteriaList([
+                TurnStoppingCriteria(tokenizer, input_ids.shape[1], stop_ids, max_sentences)
+            ])
+        with torch.no_grad():
+            outputs = model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=max_new_tokens,
+                pad_token_id=pad_token_id,
+                **sampling
+            )
+        decoded = decode_new_tokens(tokenizer, outputs, input_ids.shape[1], stop_ids, max_sentences)
+        for i, text in zip(indices, decoded):
+            results[i] = text
+    return results
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
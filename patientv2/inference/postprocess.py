@@ -0,0 +1,97 @@
+import re
+
+# 로컬 모델 출력 후처리: 새로 생성된 토큰만 대상으로 종료 시퀀스(토큰 단위)와 문장 수 제한 적용
+# 백엔드(backend/models/local_model.py)도 이 모듈을 그대로 import → 서빙과 평가/하이퍼파라미터 선택 출력이 같은 위치에서 잘림
+STOP_SEQUENCES = ["<|im_end|>", "<|endoftext|>", "<|im_start|>", "Therapist:", "XXX:"]
+MAX_SENTENCES = 5  # 프롬프트의 "maximum of 5 sentences" 지침
+
+# 문장 끝(. ! ?) 뒤에 공백과 대문자/따옴표가 오는 경우만 경계로 봄 ("I guess... it's"는 한 문장)
+SENTENCE_BOUNDARY = re.compile(r"(?:(?<=[.!?])|(?<=[.!?][\"'”’)]))\s+(?=[A-Z\"“‘(])")
+
+
+def stop_token_ids(tokenizer, stop_sequences=STOP_SEQUENCES):
+    # 앞 공백/줄바꿈 유무에 따라 토큰화가 달라지므로 변형까지 토큰 시퀀스로 등록
+    sequences = set()
+    for stop in stop_sequences:
+        for variant in (stop, " " + stop, "\n" + stop):
+            ids = tokenizer.encode(variant, add_special_tokens=False)
+            if ids:
+                sequences.add(tuple(ids))
+    if tokenizer.eos_token_id is not None:
+        sequences.add((tokenizer.eos_token_id,))
+    return sorted(sequences, key=len)
+
+
+def cut_at_stop(token_ids, stop_ids):
+    # 가장 먼저 나타나는 종료 시퀀스 앞까지의 토큰만 반환
+    token_ids = list(token_ids)
+    for end in range(len(token_ids)):
+        for stop in stop_ids:
+            start = end - len(stop) + 1
+            if start >= 0 and tuple(token_ids[start:end + 1]) == stop:
+                return token_ids[:start]
+    return token_ids
+
+
+def truncate_sentences(text: str, max_sentences: int = MAX_SENTENCES) -> str:
+    if not max_sentences:
+        return text.strip()
+    sentences = SENTENCE_BOUNDARY.split(text.strip())
+    return " ".join(s.strip() for s in sentences[:max_sentences]).strip()
+
+
+def postprocess_tokens(tokenizer, token_ids, stop_ids=None, max_sentences: int = MAX_SENTENCES) -> str:
+    if stop_ids is None:
+        stop_ids = stop_token_ids(tokenizer)
+    text = tokenizer.decode(cut_at_stop(token_ids, stop_ids), skip_special_tokens=True)
+    return truncate_sentences(text, max_sentences)
+
+
+def decode_new_tokens(tokenizer, outputs, input_length, stop_ids=None, max_sentences=MAX_SENTENCES):
+    # outputs: generate 결과 [batch, seq]. 프롬프트를 다시 디코딩하지 않고 input_length 이후만 처리
+    if stop_ids is None:
+        stop_ids = stop_token_ids(tokenizer)
+    return [
+        postprocess_tokens(tokenizer, row[input_length:].tolist(), stop_ids, max_sentences)
+        for row in outputs
+    ]
+
+
+class StreamStopFilter:
+    # 스트리밍용: 종료 문자열이 조각 경계에 걸쳐 올 수 있으므로 가장 긴 종료 문자열 길이만큼 보류 후 내보냄
+    def __init__(self, stop_sequences=STOP_SEQUENCES, max_sentences: int = MAX_SENTENCES):
+        self.stop_sequences = stop_sequences
+        self.max_sentences = max_sentences
+        self.holdback = max(len(s) for s in stop_sequences) - 1
+        self.buffer = ""
+        self.emitted = 0
+        self.stopped = False
+
+    def _limit(self, text: str) -> int:
+        # 버퍼에서 내보낼 수 있는 최대 위치 (종료 문자열 또는 문장 제한 중 먼저 오는 곳)
+        positions = [i for i in (text.find(s) for s in self.stop_sequences) if i >= 0]
+        if self.max_sentences:
+            boundaries = list(SENTENCE_BOUNDARY.finditer(text))
+            if len(boundaries) >= self.max_sentences:
+                positions.append(boundaries[self.max_sentences - 1].start())
+        return min(positions) if positions else -1
+
+    def feed(self, text: str) -> str:
+        if self.stopped:
+            return ""
+        self.buffer += text
+        limit = self._limit(self.buffer)
+        if limit >= 0:
+            self.stopped = True
+            end = limit
+        else:
+            end = max(self.emitted, len(self.buffer) - self.holdback)
+        chunk, self.emitted = self.buffer[self.emitted:end], max(self.emitted, end)
+        return chunk
+
+    def flush(self) -> str:
+        if self.stopped:
+            return ""
+        self.stopped = True
+        chunk, self.emitted = self.buffer[self.emitted:].rstrip(), len(self.buffer)
+        return chunk
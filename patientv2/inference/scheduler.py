@@ -0,0 +1,164 @@
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import time
+from pathlib import Path
+
+import torch
+
+from inference.batched import generate_batched
+from inference.sweep import AdapterSweep, save_atomic, existing_count, print_report, SWEEP_SEED
+
+# (체크포인트 × 예제 shard) 작업을 여러 프로세스에 나눠 실행하는 스케줄러
+# shard 결과는 progress_dir에 파일로 남기 때문에 중간에 죽어도 다시 실행하면 끝난 shard는 건너뜀
+
+
+def conversations_fingerprint(conversations, shard_size, batch_size=None, seed=None, generate_kwargs=None):
+    # 입력 subset, shard/배치 크기, 시드, 생성 설정(max_new_tokens 등) 중 하나라도 바뀌면 다른 progress 디렉토리를 쓰도록
+    # 지문을 만듦 → 설정이 다른 shard가 섞인 채로 이어서 실행되지 않음
+    payload = json.dumps({
+        "shard_size": shard_size,
+        "batch_size": batch_size,
+        "seed": seed,
+        "generate_kwargs": generate_kwargs or {},
+        "conversations": conversations,
+    }, sort_keys=True, ensure_ascii=False, default=repr)
+    return hashlib.sha256(payload.encode()).hexdigest()[:12]
+
+
+def shard_path(progress_dir, name, shard):
+    return Path(progress_dir) / name / f"shard_{shard:05d}.json"
+
+
+def default_devices(workers=None):
+    # GPU가 있으면 GPU마다 워커 하나, 없으면 CPU 워커 (코어를 나눠 씀)
+    if torch.cuda.is_available():
+        devices = [f"cuda:{i}" for i in range(torch.cuda.device_count())]
+        return [devices[i % len(devices)] for i in range(workers or len(devices))]
+    return ["cpu"] * (workers or max(1, min(4, (os.cpu_count() or 1) // 4)))
+
+
+def _write_shard(path, indices, responses, load_sec, generate_sec, worker):
+    # load_sec: 이 shard를 위해 어댑터(워커의 첫 shard이면 베이스 모델 포함)를 로드한 시간. 이미 활성화돼 있었으면 0
+    with open(path, "w") as f:
+        json.dump({"indices": indices, "responses": responses, "load_sec": load_sec, "generate_sec": generate_sec,
+                   "worker": worker}, f, ensure_ascii=False)
+
+
+def _worker(worker_id, device, queue, conversations, batch_size, seed, threads, generate_kwargs):
+    if device == "cpu":
+        torch.set_num_threads(threads)
+    # 워커마다 베이스 모델을 한 번 로드하고, 체크포인트가 바뀔 때만 어댑터 교체
+    sweep = AdapterSweep(device_map={"": device})
+    failed = 0
+    while True:
+        item = queue.get()
+        if item is None:
+            break
+        name, adapter_path, shard, indices, path = item
+        try:
+            start = time.perf_counter()
+            model, tokenizer = sweep.activate(name, adapter_path)
+            load_sec = round(time.perf_counter() - start, 2)
+            # 어느 워커가 처리하든 같은 결과가 나오도록 shard별로 시드 고정
+            torch.manual_seed(seed + shard)
+            start = time.perf_counter()
+            responses = generate_batched(
+                model, tokenizer, [conversations[i] for i in indices],
+                batch_size=batch_size, desc=f"[{worker_id}] {name}#{shard}", **generate_kwargs
+            )
+            save_atomic(path, _write_shard, indices, responses, load_sec, round(time.perf_counter() - start, 2), worker_id)
+        except Exception as e:
+            failed += 1
+            print(f"❌ [{worker_id}] {name} shard {shard} 실패: {e}")
+    if failed:
+        raise SystemExit(1)
+
+
+def pending_items(checkpoints, conversations, progress_dir, shard_size):
+    items = []
+    for name, adapter_path in checkpoints:
+        Path(progress_dir, name).mkdir(parents=True, exist_ok=True)
+        for shard, start in enumerate(range(0, len(conversations), shard_size)):
+            path = shard_path(progress_dir, name, shard)
+            if not path.exists():
+                indices = list(range(start, min(start + shard_size, len(conversations))))
+                items.append((name, adapter_path, shard, indices, str(path)))
+    return items
+
+
+def merge_checkpoint(name, adapter_path, conversations, progress_dir, shard_size, output_file, write_fn):
+    # shard 번호 순서대로 이어 붙여 원래 예제 순서를 복원. 빠진 shard가 있으면 병합하지 않음
+    # load_sec/generate_sec은 shard들의 합 (여러 워커가 같은 체크포인트를 나눠 맡으면 각 워커의 어댑터 로드가 모두 더해짐)
+    responses = [None] * len(conversations)
+    load_sec = 0.0
+    generate_sec = 0.0
+    for shard in range((len(conversations) + shard_size - 1) // shard_size):
+        path = shard_path(progress_dir, name, shard)
+        if not path.exists():
+            return None
+        with open(path, "r") as f:
+            data = json.load(f)
+        for i, response in zip(data["indices"], data["responses"]):
+            responses[i] = response
+        load_sec += data["load_sec"]
+        generate_sec += data["generate_sec"]
+    save_atomic(output_file, write_fn, responses, adapter_path)
+    return {
+        "checkpoint": name,
+        "skipped": False,
+        "load_sec": round(load_sec, 2),
+        "generate_sec": round(generate_sec, 2),
+        "examples_per_sec": round(len(responses) / generate_sec, 3) if generate_sec > 0 else None,
+    }
+
+
+def run_sharded_sweep(checkpoints, conversations, output_path, write_fn, progress_dir, workers=None, devices=None,
+                      shard_size=16, batch_size=8, report_path=None, seed=SWEEP_SEED, **generate_kwargs):
+    # checkpoints: [(이름, 어댑터 경로)], output_path(이름, 경로) → 결과 파일, write_fn(파일, 응답 목록, 어댑터 경로)
+    # 워커가 하나여도 같은 경로(shard 단위 시드/재개)로 실행 → 워커 수와 관계없이 같은 결과
+    progress_dir = Path(progress_dir) / conversations_fingerprint(conversations, shard_size, batch_size, seed, generate_kwargs)
+    todo = [(name, path) for name, path in checkpoints if existing_count(output_path(name, path)) != len(conversations)]
+    items = pending_items(todo, conversations, progress_dir, shard_size)
+    devices = devices or default_devices(workers)
+    print(f"🧮 체크포인트 {len(todo)}/{len(checkpoints)}개, 남은 shard {len(items)}개, 워커 {len(devices)}개 ({', '.join(devices)})")
+
+    failed = False
+    if items:
+        ctx = mp.get_context("spawn")
+        queue = ctx.Queue()
+        for item in items:
+            queue.put(item)
+        for _ in devices:
+            queue.put(None)
+        threads = max(1, (os.cpu_count() or 1) // devices.count("cpu")) if "cpu" in devices else 1
+        processes = [
+            ctx.Process(target=_worker, args=(i, device, queue, conversations, batch_size, seed, threads, generate_kwargs))
+            for i, device in enumerate(devices)
+        ]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+        failed = any(p.exitcode != 0 for p in processes)
+
+    report = []
+    for name, adapter_path in checkpoints:
+        if (name, adapter_path) not in todo:
+            report.append({"checkpoint": name, "skipped": True})
+            continue
+        row = merge_checkpoint(name, adapter_path, conversations, progress_dir, shard_size, output_path(name, adapter_path), write_fn)
+        if row is None:
+            print(f"⚠️ {name}: 완료되지 않은 shard가 있어 병합하지 않음 (다시 실행하면 이어서 진행)")
+            continue
+        report.append(row)
+
+    print_report(report)
+    if report_path:
+        Path(report_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, "w") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if failed:
+        raise RuntimeError("일부 워커가 실패했습니다. 다시 실행하면 끝난 shard는 건너뜁니다.")
+    return report
@@ -0,0 +1,54 @@
+import torch
+from transformers import StoppingCriteria
+
+from inference.postprocess import SENTENCE_BOUNDARY, MAX_SENTENCES, stop_token_ids
+
+
+# 백엔드(backend/models/local_model.py)도 이 모듈을 그대로 import → 서빙과 오프라인 생성이 같은 역할 표시에서 멈춤
+
+
+class TurnStoppingCriteria(StoppingCriteria):
+    # 환자 한 턴이 끝나면 생성을 멈춤: 종료 토큰(EOS/<|im_end|>), 역할 전환 표시("Therapist:", "XXX:"), 문장 수 제한
+    # 배치의 행마다 따로 판단해 [batch] bool 텐서를 반환 (끝난 행은 이후 패딩으로 채워짐)
+    def __init__(self, tokenizer, prompt_length, stop_ids=None, max_sentences=MAX_SENTENCES):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_ids = stop_ids if stop_ids is not None else stop_token_ids(tokenizer)
+        self.max_sentences = max_sentences
+        self.done = None
+        self.tails = None
+        self.sentences = None
+
+    def _hit_stop(self, ids):
+        return any(len(stop) <= len(ids) and tuple(ids[-len(stop):]) == stop for stop in self.stop_ids)
+
+    def _count_boundaries(self, row, token_id):
+        # 새 토큰만 디코딩해 직전 몇 글자와 이어 붙이고, 이번 토큰에서 완성된 문장 경계만 셈
+        piece = self.tokenizer.decode([token_id], skip_special_tokens=True)
+        tail = self.tails[row]
+        text = tail + piece
+        self.sentences[row] += sum(1 for m in SENTENCE_BOUNDARY.finditer(text) if m.end() > len(tail))
+        self.tails[row] = text[-8:]
+
+    def __call__(self, input_ids, scores, **kwargs):
+        batch = input_ids.shape[0]
+        if self.done is None:
+            self.done = [False] * batch
+            self.tails = [""] * batch
+            self.sentences = [0] * batch
+
+        generated = input_ids.shape[1] - self.prompt_length
+        if generated > 0:
+            window = max(len(stop) for stop in self.stop_ids)
+            recent = input_ids[:, -min(window, generated):].tolist()
+            for row in range(batch):
+                if self.done[row]:
+                    continue
+                if self._hit_stop(recent[row]):
+                    self.done[row] = True
+                    continue
+                if self.max_sentences:
+                    self._count_boundaries(row, recent[row][-1])
+                    # 다음 문장의 첫 토큰이 나온 시점 = 제한 문장 수를 모두 채운 시점 (초과분은 후처리에서 잘림)
+                    self.done[row] = self.sentences[row] >= self.max_sentences
+        return torch.tensor(self.done, dtype=torch.bool, device=input_ids.device)
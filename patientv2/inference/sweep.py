@@ -0,0 +1,101 @@
+import json
+import os
+
+import torch
+from peft import PeftConfig, PeftModel
+from transformers import AutoTokenizer, AutoModelForCausalLM
+
+SWEEP_SEED = 42  # 모든 체크포인트가 같은 평가 subset/샘플링 시드를 쓰도록 고정
+
+
+# psi_*.py가 저장하는 디렉토리 이름 규칙 (예: 0.5B_EP2_LR1e-4)
+def checkpoint_name(prefix, epoch, lr):
+    return f"{prefix}_EP{epoch}_LR{lr:.0e}".replace("e-0", "e-").replace("e+0", "e+")
+
+
+# Trainer의 checkpoint-N 하위 디렉토리가 있으면 가장 마지막 것, 없으면 디렉토리 자체
+def latest_checkpoint(model_dir):
+    checkpoints = [ckpt for ckpt in os.listdir(model_dir) if ckpt.startswith("checkpoint-")]
+    if not checkpoints:
+        return str(model_dir)
+    return os.path.join(model_dir, sorted(checkpoints, key=lambda x: int(x.split("-")[1]))[-1])
+
+
+def sweep_grid(model_root, prefix, epochs, lrs, use_latest_checkpoint=False):
+    grid = []
+    for epoch in epochs:
+        for lr in lrs:
+            name = checkpoint_name(prefix, epoch, lr)
+            path = os.path.join(model_root, name)
+            grid.append((name, latest_checkpoint(path) if use_latest_checkpoint else path))
+    return grid
+
+
+# 이미 저장된 결과의 응답 개수 (.json은 {"responses": [...]}, .jsonl은 줄 수). 없거나 깨졌으면 0
+def existing_count(path):
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r") as f:
+            if str(path).endswith(".json"):
+                return len(json.load(f)["responses"])
+            return sum(1 for line in f if line.strip())
+    except (ValueError, KeyError):
+        return 0
+
+
+# 중간에 죽어도 반쯤 쓴 파일이 완료로 보이지 않도록 임시 파일에 쓴 뒤 교체
+def save_atomic(path, write_fn, *args):
+    tmp_path = f"{path}.tmp"
+    write_fn(tmp_path, *args)
+    os.replace(tmp_path, path)
+
+
+# parameter/dev_outputs/*.json 형식
+def write_dev_output(path, responses, model_dir):
+    with open(path, "w") as f:
+        json.dump({"model_dir": str(model_dir), "responses": responses}, f, ensure_ascii=False, indent=2)
+
+
+class AdapterSweep:
+    # 베이스 모델은 한 번만 로드하고, 체크포인트마다 LoRA 어댑터만 교체 (load_adapter → set_adapter → 이전 어댑터 삭제)
+    def __init__(self, base_model=None, torch_dtype=None, device_map="auto"):
+        self.base_model = base_model
+        self.torch_dtype = torch_dtype or (torch.bfloat16 if torch.cuda.is_available() else torch.float32)
+        self.device_map = device_map
+        self.model = None
+        self.tokenizer = None
+        self.active = None
+
+    def _load_base(self, adapter_path):
+        base_name = self.base_model or PeftConfig.from_pretrained(adapter_path).base_model_name_or_path
+        self.tokenizer = AutoTokenizer.from_pretrained(base_name, trust_remote_code=True)
+        base = AutoModelForCausalLM.from_pretrained(
+            base_name,
+            torch_dtype=self.torch_dtype,
+            device_map=self.device_map,
+            trust_remote_code=True
+        )
+        return base
+
+    def activate(self, name, adapter_path):
+        if self.active == name:
+            return self.model, self.tokenizer
+        if self.model is None:
+            self.model = PeftModel.from_pretrained(self._load_base(adapter_path), adapter_path, adapter_name=name)
+        else:
+            self.model.load_adapter(adapter_path, adapter_name=name)
+            self.model.set_adapter(name)
+            self.model.delete_adapter(self.active)
+        self.model.eval()
+        self.active = name
+        return self.model, self.tokenizer
+
+
+def print_report(report):
+    print(f"\n{'checkpoint':<24} {'load(s)':>8} {'gen(s)':>8} {'ex/s':>7}")
+    for row in report:
+        if row["skipped"]:
+            print(f"{row['checkpoint']:<24} {'skip':>8}")
+            continue
+        print(f"{row['checkpoint']:<24} {row['load_sec']:>8.1f} {row['generate_sec']:>8.1f} {row['examples_per_sec'] or 0:>7.2f}")
@@ -0,0 +1,181 @@
+import json
+import os
+import time
+from pathlib import Path
+
+import httpx
+from dotenv import load_dotenv
+from tqdm import tqdm
+
+from llm.cache import openai_chat_completion, llm_cache
+
+load_dotenv()
+
+# OpenAI Batch API 모드
+#   OPENAI_BATCH=off      요청마다 동기 호출 (기본)
+#   OPENAI_BATCH=batch    배치 제출 후 완료될 때까지 기다려 결과 반영
+#   OPENAI_BATCH=submit   배치만 제출하고 종료 (상태 파일에 batch id 저장)
+#   OPENAI_BATCH=collect  상태 파일의 배치가 끝날 때까지 기다려 결과 반영. 상태 파일에 없는 요청이 있으면
+#                         (예: 앞 라운드 결과에 따라 정해지는 다음 라운드) 그 요청만 새 배치로 제출하고 종료
+# 어떤 모드든 LLM 캐시에 있는 요청은 다시 보내지 않고, 배치 결과도 캐시에 저장
+OPENAI_BATCH = os.getenv("OPENAI_BATCH", "off")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+BATCH_POLL_SEC = float(os.getenv("BATCH_POLL_SEC", "30"))
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_DONE = {"completed", "failed", "expired", "cancelled"}
+
+
+def to_batch_line(custom_id, payload):
+    return {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": payload}
+
+
+class BatchClient:
+    # Files/Batches API 최소 구현 (OPENAI_BASE_URL을 llm/mock_server.py로 바꾸면 가짜 배치 서버 사용)
+    def __init__(self, base_url=OPENAI_BASE_URL, api_key=None, timeout=120.0):
+        self.client = httpx.Client(
+            base_url=base_url.rstrip("/"),
+            headers={"Authorization": f"Bearer {api_key or os.getenv('OPENAI_API_KEY')}"},
+            timeout=timeout,
+        )
+
+    def upload(self, path):
+        with open(path, "rb") as f:
+            response = self.client.post("/files", data={"purpose": "batch"}, files={"file": (Path(path).name, f)})
+        response.raise_for_status()
+        return response.json()["id"]
+
+    def create(self, input_file_id, metadata=None):
+        response = self.client.post("/batches", json={
+            "input_file_id": input_file_id,
+            "endpoint": BATCH_ENDPOINT,
+            "completion_window": "24h",
+            "metadata": metadata or {},
+        })
+        response.raise_for_status()
+        return response.json()
+
+    def get(self, batch_id):
+        response = self.client.get(f"/batches/{batch_id}")
+        response.raise_for_status()
+        return response.json()
+
+    def content(self, file_id):
+        response = self.client.get(f"/files/{file_id}/content")
+        response.raise_for_status()
+        return response.text
+
+    def close(self):
+        self.client.close()
+
+
+def submit(requests, state_path, client):
+    # requests: [(custom_id, payload, sample)] → 입력 JSONL 작성, 업로드, 배치 생성 후 상태 파일 저장
+    input_path = f"{state_path}.input.jsonl"
+    with open(input_path, "w", encoding="utf-8") as f:
+        for custom_id, payload, _ in requests:
+            f.write(json.dumps(to_batch_line(custom_id, payload), ensure_ascii=False) + "\n")
+    file_id = client.upload(input_path)
+    batch = client.create(file_id, metadata={"source": Path(state_path).stem})
+    state = {
+        "batch_id": batch["id"],
+        "input_file_id": file_id,
+        "submitted_at": time.time(),
+        "requests": {custom_id: {"payload": payload, "sample": sample} for custom_id, payload, sample in requests},
+    }
+    with open(state_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    print(f"📤 배치 제출: {batch['id']} ({len(requests)}개 요청, 상태 파일 {state_path})")
+    return state
+
+
+def collect(state_path, client, requests=None, poll_sec=BATCH_POLL_SEC):
+    # 배치가 끝날 때까지 polling 후 결과를 custom_id → 응답 텍스트로 반환 (실패한 요청은 빠짐)
+    # requests가 주어지면 상태 파일의 요청 본문이 현재 요청과 같은 결과만 반환 (submit 이후 입력이 바뀌어
+    # 같은 custom_id가 다른 요청을 가리키는 경우 엉뚱한 샘플에 붙지 않도록). 캐시에는 원래 요청 기준으로 저장
+    with open(state_path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+    while True:
+        batch = client.get(state["batch_id"])
+        if batch["status"] in BATCH_DONE:
+            break
+        counts = batch.get("request_counts") or {}
+        print(f"⏳ 배치 {batch['id']}: {batch['status']} ({counts.get('completed', 0)}/{counts.get('total', '?')})")
+        time.sleep(poll_sec)
+
+    current = None if requests is None else {custom_id: (payload, sample) for custom_id, payload, sample in requests}
+    results = {}
+    stale = 0
+    if batch.get("output_file_id"):
+        for line in client.content(batch["output_file_id"]).splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                continue
+            request = state["requests"].get(item["custom_id"])
+            if request is None:
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            llm_cache.put(request["payload"], content, request["sample"])
+            if current is not None and current.get(item["custom_id"]) != (request["payload"], request["sample"]):
+                stale += 1
+                continue
+            results[item["custom_id"]] = content
+    failed = len(state["requests"]) - len(results) - stale
+    print(f"📥 배치 {batch['id']} {batch['status']}: 성공 {len(results)}개, 실패 {failed}개"
+          + (f", 현재 요청과 달라 무시 {stale}개" if stale else ""))
+    return results
+
+
+def unsubmitted(requests, state_path):
+    # 상태 파일의 배치에 (같은 본문으로) 들어 있지 않은 요청
+    if not os.path.exists(state_path):
+        return list(requests)
+    with open(state_path, "r", encoding="utf-8") as f:
+        submitted = json.load(f)["requests"]
+    return [
+        (custom_id, payload, sample) for custom_id, payload, sample in requests
+        if submitted.get(custom_id) != {"payload": payload, "sample": sample}
+    ]
+
+
+def run_requests(requests, state_path, mode=OPENAI_BATCH):
+    # requests: [(custom_id, payload, sample)]. 모든 요청의 결과를 custom_id → 응답 텍스트로 반환
+    # submit 모드, 또는 collect 모드에서 아직 제출되지 않은 요청이 있으면 제출만 하고 None 반환
+    # (나중에 OPENAI_BATCH=collect로 다시 실행)
+    if mode not in ("off", "batch", "submit", "collect"):
+        raise ValueError(f"OPENAI_BATCH must be off/batch/submit/collect, got {mode!r}")
+
+    results = {}
+    pending = []
+    for custom_id, payload, sample in requests:
+        cached = llm_cache.get(payload, sample)
+        if cached is not None:
+            results[custom_id] = cached
+        else:
+            pending.append((custom_id, payload, sample))
+
+    if mode == "off":
+        for custom_id, payload, sample in tqdm(pending, desc="OpenAI 요청"):
+            results[custom_id] = openai_chat_completion(payload, sample)
+        return results
+    if not pending:
+        return results
+
+    client = BatchClient()
+    try:
+        if mode in ("batch", "submit"):
+            submit(pending, state_path, client)
+            if mode == "submit":
+                return None
+        missing = unsubmitted(pending, state_path)
+        if os.path.exists(state_path) and len(missing) < len(pending):
+            results.update(collect(state_path, client, pending))
+        if mode == "collect" and missing:
+            # 상태 파일의 배치는 위에서 결과를 캐시에 반영했으므로 새 배치로 교체해도 잃는 결과가 없음
+            submit(missing, state_path, client)
+            return None
+    finally:
+        client.close()
+    return results
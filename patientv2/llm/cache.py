@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# OpenAI 호출 결과 디스크 캐시 (SQLite). 같은 (모델, messages, temperature, 샘플 번호) 요청은 다시 비용을 내지 않음
+#   LLM_CACHE=on       캐시 사용 (기본)
+#   LLM_CACHE=off      캐시를 읽지도 쓰지도 않음 (bypass)
+#   LLM_CACHE=refresh  캐시를 읽지 않고 새로 호출한 결과로 덮어씀
+LLM_CACHE = os.getenv("LLM_CACHE", "on")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+
+
+def cache_key(payload, sample=0):
+    # payload: Chat Completions 요청 본문 (model, messages, temperature 등). sample은 같은 요청의 몇 번째 샘플인지
+    # (예: 환자 ID) — temperature > 0에서 서로 다른 샘플이 필요한 호출을 구분
+    signature = {"payload": payload, "sample": sample}
+    return hashlib.sha256(json.dumps(signature, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path=LLM_CACHE_PATH, mode=LLM_CACHE):
+        if mode not in ("on", "off", "refresh"):
+            raise ValueError(f"LLM_CACHE must be on/off/refresh, got {mode!r}")
+        self.path = path
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS completions ("
+                "key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, payload, sample=0):
+        if self.mode != "on":
+            return None
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT response FROM completions WHERE key = ?", (cache_key(payload, sample),)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, payload, response, sample=0):
+        if self.mode == "off":
+            return
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO completions (key, model, response, created_at) VALUES (?, ?, ?, ?)",
+                (cache_key(payload, sample), payload.get("model"), response, time.time()),
+            )
+        self.writes += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        print(f"🗄️ LLM 캐시({s['mode']}): hit {s['hits']}, miss {s['misses']}, 저장 {s['writes']}, 적중률 {s['hit_ratio']:.1%}")
+
+
+llm_cache = LLMCache()
+
+
+def openai_chat_completion(payload, sample=0, cache=llm_cache):
+    # 캐시를 확인하지 않고 openai.ChatCompletion.create를 호출한 뒤 결과만 캐시에 저장
+    import openai
+
+    response = openai.ChatCompletion.create(**payload)
+    content = response["choices"][0]["message"]["content"]
+    cache.put(payload, content, sample)
+    return content
+
+
+def cached_chat_completion(messages, model, temperature=0.7, sample=0, cache=llm_cache, **kwargs):
+    # 동기 스크립트용: openai.ChatCompletion.create 호출을 캐시로 감싸고 응답 텍스트를 반환
+    payload = {"model": model, "messages": messages, "temperature": temperature, **kwargs}
+    cached = cache.get(payload, sample)
+    if cached is not None:
+        return cached
+    return openai_chat_completion(payload, sample, cache)
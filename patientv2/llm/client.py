@@ -0,0 +1,201 @@
+from contextlib import asynccontextmanager
+import asyncio
+import importlib.util
+import os
+import random
+import time
+
+import httpx
+from dotenv import load_dotenv
+
+from llm.cache import llm_cache
+
+load_dotenv()
+
+# 비동기 OpenAI 클라이언트 설정 (데이터 생성/평가 스크립트 기본값. 백엔드는 동시성/타임아웃 기본값만 따로 지정)
+# OPENAI_BASE_URL을 mock 서버(llm/mock_server.py)로 바꾸면 실제 API 없이 파이프라인 테스트 가능
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "16"))
+OPENAI_RPM = float(os.getenv("OPENAI_RPM", "500"))
+OPENAI_TPM = float(os.getenv("OPENAI_TPM", "200000"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_TIMEOUT_SEC = float(os.getenv("OPENAI_TIMEOUT_SEC", "120"))
+# HTTP/2는 h2 패키지(httpx[http2])가 있을 때만 사용
+OPENAI_HTTP2 = os.getenv("OPENAI_HTTP2", "1") != "0" and importlib.util.find_spec("h2") is not None
+
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+BACKOFF_BASE_SEC = 0.5
+BACKOFF_MAX_SEC = 30.0
+
+
+class TokenBucket:
+    # 분당 허용량(rate_per_minute)만큼 채워지는 토큰 버킷. 0 이하이면 제한 없음
+    def __init__(self, rate_per_minute: float, capacity: float = None):
+        self.rate = rate_per_minute / 60
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1):
+        if self.rate <= 0:
+            return
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def estimate_tokens(payload: dict) -> int:
+    # TPM 제한용 대략적인 추정: 입력 4글자당 1토큰 + 최대 출력 토큰
+    chars = sum(len(str(m.get("content", ""))) for m in payload.get("messages", []))
+    return chars // 4 + payload.get("max_tokens", 512)
+
+
+def backoff_delay(attempt: int, response: httpx.Response = None) -> float:
+    # full jitter 지수 백오프. Retry-After 헤더가 있으면 그 이상 대기
+    delay = random.uniform(0, min(BACKOFF_MAX_SEC, BACKOFF_BASE_SEC * 2 ** attempt))
+    if response is not None:
+        try:
+            delay = max(delay, float(response.headers.get("retry-after", 0)))
+        except ValueError:
+            pass
+    return delay
+
+
+class OpenAIClient:
+    # keep-alive 연결을 재사용하는 공유 클라이언트 + 동시성 제한 + RPM/TPM 토큰 버킷 + 재시도
+    # 백엔드(backend/models/openai_client.py)도 이 클래스를 그대로 사용 → 속도 제한/백오프 정책이 한 곳에만 있음
+    def __init__(
+        self,
+        base_url: str = OPENAI_BASE_URL,
+        api_key: str = None,
+        max_concurrency: int = OPENAI_MAX_CONCURRENCY,
+        rpm: float = OPENAI_RPM,
+        tpm: float = OPENAI_TPM,
+        max_retries: int = OPENAI_MAX_RETRIES,
+        timeout: float = OPENAI_TIMEOUT_SEC,
+        http2: bool = OPENAI_HTTP2,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.http2 = http2
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.request_bucket = TokenBucket(rpm)
+        self.token_bucket = TokenBucket(tpm)
+        self.requests = 0
+        self.retries = 0
+        self._client = None
+        self._loop = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # 이벤트 루프마다 하나의 클라이언트(연결 풀)를 유지
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                timeout=httpx.Timeout(self.timeout, connect=10.0),
+            )
+            self._loop = loop
+        return self._client
+
+    async def _throttle(self, payload: dict):
+        await self.request_bucket.acquire(1)
+        await self.token_bucket.acquire(estimate_tokens(payload))
+
+    async def chat_completions(self, payload: dict) -> dict:
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._throttle(payload)
+                response = None
+                try:
+                    self.requests += 1
+                    response = await self.client.post("/chat/completions", json=payload)
+                    if response.status_code not in RETRY_STATUS:
+                        response.raise_for_status()
+                        return response.json()
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                if attempt == self.max_retries:
+                    response.raise_for_status()
+                self.retries += 1
+                await asyncio.sleep(backoff_delay(attempt, response))
+
+    @asynccontextmanager
+    async def stream_chat(self, payload: dict):
+        # 스트리밍은 응답 헤더를 받기 전까지만 재시도 (토큰을 보낸 뒤에는 다시 시작할 수 없음)
+        payload = dict(payload, stream=True)
+        async with self.semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._throttle(payload)
+                try:
+                    request = self.client.build_request("POST", "/chat/completions", json=payload)
+                    response = await self.client.send(request, stream=True)
+                except httpx.TransportError:
+                    if attempt == self.max_retries:
+                        raise
+                    self.retries += 1
+                    await asyncio.sleep(backoff_delay(attempt))
+                    continue
+
+                if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                    await response.aclose()
+                    self.retries += 1
+                    await asyncio.sleep(backoff_delay(attempt, response))
+                    continue
+
+                try:
+                    response.raise_for_status()
+                    yield response
+                finally:
+                    await response.aclose()
+                return
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class AsyncLLMClient(OpenAIClient):
+    # OpenAIClient + LLM 캐시(llm/cache.py). 데이터 생성/평가 스크립트용
+    def __init__(self, *args, cache=llm_cache, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+
+    async def chat(self, messages, model="gpt-4-turbo", temperature=0.7, sample=0, **kwargs):
+        # openai.ChatCompletion.create(...).choices[0].message.content 와 같은 값을 반환
+        # sample: 캐시 키에 들어가는 샘플 번호 (같은 프롬프트로 서로 다른 결과가 필요한 경우 구분)
+        payload = {"model": model, "messages": messages, "temperature": temperature, **kwargs}
+        if self.cache is not None:
+            cached = self.cache.get(payload, sample)
+            if cached is not None:
+                return cached
+        response = await self.chat_completions(payload)
+        content = response["choices"][0]["message"]["content"]
+        if self.cache is not None:
+            self.cache.put(payload, content, sample)
+        return content
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
@@ -0,0 +1,159 @@
+# 데이터 생성/평가 파이프라인 테스트용 OpenAI mock 서버 (Chat Completions + Files/Batches)
+#   python llm/mock_server.py --port 9000
+#   OPENAI_BASE_URL=http://localhost:9000/v1 python data/data_generation.py
+#   OPENAI_BASE_URL=http://localhost:9000/v1 OPENAI_BATCH=batch BATCH_POLL_SEC=1 python response/nano_response.py
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "300"))
+MOCK_JITTER_MS = float(os.getenv("MOCK_JITTER_MS", "100"))
+# 일정 비율로 429/500을 돌려 재시도 동작을 확인
+MOCK_ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+# 배치가 completed 상태가 되기까지 걸리는 시간
+MOCK_BATCH_DELAY_SEC = float(os.getenv("MOCK_BATCH_DELAY_SEC", "3"))
+
+MOCK_TEXT = "After a tense meeting, their manager criticized their report in front of the whole team."
+MOCK_CCD = {
+    "intermediate_beliefs": "If I make a mistake, people will see I am incompetent.",
+    "intermediate_beliefs_depressed": "Every mistake proves I will never be good enough.",
+    "coping_strategies": "Overpreparing and avoiding situations where they might be judged.",
+    "automatic_thoughts": ["I always mess things up.", "They think I'm useless.", "I should just quit."],
+    "emotions": ["anxious", "ashamed", "sad"],
+    "behaviors": ["withdrawal", "overworking", "avoiding colleagues"],
+    "conversational_styles": ["reserved"],
+}
+
+app = FastAPI()
+stats = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0, "batches": 0, "batch_requests": 0}
+files = {}
+batches = {}
+
+
+def completion(model, content):
+    return {
+        "id": f"chatcmpl-mock-{stats['requests']}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": len(content.split()), "total_tokens": len(content.split())},
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(req: Request):
+    body = await req.json()
+    stats["requests"] += 1
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        await asyncio.sleep(max(0.0, random.gauss(MOCK_LATENCY_MS, MOCK_JITTER_MS)) / 1000)
+    finally:
+        stats["in_flight"] -= 1
+
+    if random.random() < MOCK_ERROR_RATE:
+        stats["errors"] += 1
+        status = random.choice([429, 500])
+        return JSONResponse({"error": {"message": "mock error"}}, status_code=status, headers={"Retry-After": "0"})
+
+    return completion(body.get("model", "mock"), mock_content(body))
+
+
+def mock_content(body):
+    # JSON을 요구하는 프롬프트(CCD 생성 등)에는 JSON으로, 평가 프롬프트에는 "A"/"B"로 응답
+    prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+    if "JSON" in prompt:
+        return json.dumps(MOCK_CCD)
+    if '"A" or "B"' in prompt:
+        return random.choice(["A", "B"])
+    return MOCK_TEXT
+
+
+@app.post("/v1/files")
+async def upload_file(req: Request):
+    form = await req.form()
+    upload = form["file"]
+    file_id = f"file-mock-{len(files) + 1}"
+    files[file_id] = (await upload.read()).decode("utf-8")
+    return {"id": file_id, "object": "file", "purpose": form.get("purpose"), "filename": upload.filename}
+
+
+@app.get("/v1/files/{file_id}/content")
+async def file_content(file_id: str):
+    if file_id not in files:
+        return JSONResponse({"error": {"message": "file not found"}}, status_code=404)
+    return PlainTextResponse(files[file_id])
+
+
+@app.post("/v1/batches")
+async def create_batch(req: Request):
+    body = await req.json()
+    if body.get("input_file_id") not in files:
+        return JSONResponse({"error": {"message": "input file not found"}}, status_code=400)
+    batch_id = f"batch-mock-{len(batches) + 1}"
+    # 결과는 바로 만들어 두고 MOCK_BATCH_DELAY_SEC 뒤에 completed로 공개
+    lines = []
+    failed = 0
+    for line in files[body["input_file_id"]].splitlines():
+        if not line.strip():
+            continue
+        request = json.loads(line)
+        if random.random() < MOCK_ERROR_RATE:
+            result = {"status_code": 500, "body": {"error": {"message": "mock error"}}}
+            failed += 1
+        else:
+            result = {"status_code": 200, "body": completion(request["body"].get("model", "mock"), mock_content(request["body"]))}
+        lines.append(json.dumps({"id": f"{batch_id}-{len(lines)}", "custom_id": request["custom_id"], "response": result, "error": None}))
+    output_file_id = f"file-mock-{len(files) + 1}"
+    files[output_file_id] = "\n".join(lines) + "\n"
+    stats["batches"] += 1
+    stats["batch_requests"] += len(lines)
+    batches[batch_id] = {
+        "id": batch_id,
+        "object": "batch",
+        "endpoint": body.get("endpoint"),
+        "input_file_id": body["input_file_id"],
+        "completion_window": body.get("completion_window"),
+        "metadata": body.get("metadata"),
+        "created_at": int(time.time()),
+        "ready_at": time.time() + MOCK_BATCH_DELAY_SEC,
+        "result_file_id": output_file_id,
+        "request_counts": {"total": len(lines), "completed": 0, "failed": failed},
+    }
+    return await get_batch(batch_id)
+
+
+@app.get("/v1/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    batch = batches.get(batch_id)
+    if batch is None:
+        return JSONResponse({"error": {"message": "batch not found"}}, status_code=404)
+    done = time.time() >= batch["ready_at"]
+    total = batch["request_counts"]["total"]
+    public = {k: v for k, v in batch.items() if k not in ("ready_at", "result_file_id")}
+    public["status"] = "completed" if done else "in_progress"
+    public["output_file_id"] = batch["result_file_id"] if done else None
+    failed = batch["request_counts"]["failed"]
+    public["request_counts"] = {"total": total, "completed": total - failed if done else 0, "failed": failed if done else 0}
+    return public
+
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
@@ -1,12 +1,18 @@
 from pathlib import Path
-from transformers import AutoModelForCausalLM, AutoTokenizer, TrainingArguments
-from transformers import BitsAndBytesConfig, Trainer, DataCollatorWithPadding
+from transformers import AutoModelForCausalLM, AutoTokenizer
+from transformers import BitsAndBytesConfig
 from peft import LoraConfig, get_peft_model
-from datasets import load_dataset
 import torch
 import os
+import sys
 import json
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from training.dataset_cache import load_tokenized
+from training.packing import training_setup, attn_implementation
+from training.orchestrator import SweepOrchestrator
+from training.shared_prefix import trainer_for
+
 # ------------------------------
 # 1. 모델 설정
 # ------------------------------
@@ -23,6 +29,7 @@ model = AutoModelForCausalLM.from_pretrained(
     base_model,
     quantization_config=quant_config,
     device_map="auto",
+    attn_implementation=attn_implementation(),  # PSI_TRAIN_MODE=pack이면 flash_attention_2
 )
 
 tokenizer = AutoTokenizer.from_pretrained(base_model, trust_remote_code=True)
@@ -43,97 +50,43 @@ lora_config = LoraConfig(
 model = get_peft_model(model, lora_config)
 
 # ------------------------------
-# 3. 데이터셋 로드 (ChatML → Prompt 텍스트로 변환)
-# ------------------------------
-dataset = load_dataset("json", data_files="/data/yoonsuh0615/repos/patientv2/data/patient_psi_chatml.jsonl")
-
-# ------------------------------
-# 4. Prompt Formatting & Tokenization
+# 3. 데이터셋 로드 & 토크나이즈 (ChatML → prompt/응답 토큰, prompt는 -100 마스킹)
 # ------------------------------
-def format_and_tokenize(example):
-    msgs = example["messages"]
-    prompt_parts = []
-    assistant_text = None
-
-    for msg in msgs:
-        role = msg["role"]
-        content = msg["content"].strip()
-        if role == "assistant":
-            assistant_text = content
-            break
-        prompt_parts.append(f"<|im_start|>{role}\n{content}<|im_end|>")
-
-    prompt = "\n".join(prompt_parts) + "\n<|im_start|>assistant\n"
-    if not assistant_text:
-        return None  # 필터링
-
-    prompt_tokens = tokenizer(prompt, truncation=True, padding=False, add_special_tokens=False)
-    assistant_tokens = tokenizer(assistant_text, truncation=True, padding=False, add_special_tokens=False)
-
-    input_ids = prompt_tokens["input_ids"] + assistant_tokens["input_ids"]
-    labels = [-100] * len(prompt_tokens["input_ids"]) + assistant_tokens["input_ids"]
-
-    return {
-        "input_ids": torch.tensor(input_ids, dtype=torch.long),
-        "attention_mask": torch.tensor([1] * len(input_ids), dtype=torch.long),
-        "labels": torch.tensor(labels, dtype=torch.long),
-    }
-
-tokenized_dataset = dataset["train"].map(format_and_tokenize)
-tokenized_dataset = tokenized_dataset.filter(lambda x: x is not None)
+# 한 번 토크나이즈한 결과를 training/dataset_cache.py가 디스크에 캐시 → 모든 sweep run과 다른 프로세스가 재사용
+# PROMPT_LAYOUT=prefix_first: 공통 지시문을 앞에 둔 chatml_generation.py 출력 사용
+# PSI_SHARED_PREFIX=1: 모든 예제에 공통인 prompt 앞부분을 배치당 한 번만 forward (training/shared_prefix.py)
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "original")
+SHARED_PREFIX = os.getenv("PSI_SHARED_PREFIX", "0") == "1"
+DATA_FILE = "/data/yoonsuh0615/repos/patientv2/data/" + ("patient_psi_chatml_prefix.jsonl" if PROMPT_LAYOUT == "prefix_first" else "patient_psi_chatml.jsonl")
+tokenized_dataset = load_tokenized(DATA_FILE, tokenizer, shared_prefix=SHARED_PREFIX)
 
 # ------------------------------
-# 5. 학습 설정
+# 4. 학습 설정
 # ------------------------------
-from torch.nn.utils.rnn import pad_sequence
-
-def custom_collator(batch):
-    input_ids = pad_sequence([torch.tensor(item["input_ids"], dtype=torch.long) for item in batch], batch_first=True, padding_value=tokenizer.pad_token_id)
-    attention_mask = pad_sequence([torch.tensor(item["attention_mask"], dtype=torch.long) for item in batch], batch_first=True, padding_value=0)
-    labels = pad_sequence([torch.tensor(item["labels"], dtype=torch.long) for item in batch], batch_first=True, padding_value=-100)
-
-    return {
-        "input_ids": input_ids,
-        "attention_mask": attention_mask,
-        "labels": labels
-    }
-
-data_collator = custom_collator
+# PSI_TRAIN_MODE=pad(무작위 배치 패딩, 기본) / bucket(길이별 배치) / pack(블록 packing) — training/packing.py
+# 배치 단위로 한 번에 패딩하거나 이어 붙임 (예제마다 텐서를 새로 만들지 않음). tokens/sec는 output_dir/throughput.json에 기록
+train_dataset, data_collator, batch_args, callbacks = training_setup(tokenized_dataset, tokenizer, batch_size=2, grad_accum=8)
 
 EPOCHS = [2, 4, 6, 8, 10]
 LRS = [1e-4, 2e-4, 3e-4, 4e-4, 5e-4]
 
-for epoch in EPOCHS:
-    for lr in LRS:
-        output_dir = Path(__file__).parent / "model" / f"3B_EP{epoch}_LR{lr:.0e}".replace("e-0", "e-").replace("e+0", "e+")
-        if output_dir.exists():
-            print(f"⏩ Skipping: {output_dir} already exists")
-            continue
-        training_args = TrainingArguments(
-            output_dir=str(output_dir),
-            per_device_train_batch_size=2,
-            gradient_accumulation_steps=8,
-            learning_rate=lr,
-            num_train_epochs=epoch,
-            lr_scheduler_type="cosine",
-            warmup_steps=50,
-            fp16=True,
-            logging_steps=10,
-            save_strategy="epoch",
-            save_total_limit=2,
-            report_to="none"
-        )
-
-        trainer = Trainer(
-            model=model,
-            args=training_args,
-            train_dataset=tokenized_dataset,
-            tokenizer=tokenizer,
-            data_collator=data_collator
-        )
-
-        print(f"🚀 Start training: epoch={epoch}, lr={lr}")
-        trainer.train()
-        model.save_pretrained(output_dir)
-        tokenizer.save_pretrained(output_dir)
-        print(f"✅ Finished training: {output_dir}")
+# config마다 같은 LoRA 초기값에서 새로 학습, 중단되면 마지막 체크포인트 step부터 재개 (training/orchestrator.py)
+# PSI_LR_SCHEDULER=constant_with_warmup이면 LR별로 최대 epoch까지 한 번만 학습하고 epoch마다 어댑터 저장
+trainer_cls, trainer_kwargs = trainer_for(tokenized_dataset)
+sweep = SweepOrchestrator(
+    model,
+    tokenizer,
+    train_dataset,
+    data_collator,
+    training_kwargs=dict(
+        **batch_args,
+        warmup_steps=50,
+        fp16=True,
+        logging_steps=10,
+        report_to="none"
+    ),
+    callbacks=callbacks,
+    trainer_cls=trainer_cls,
+    trainer_kwargs=trainer_kwargs
+)
+sweep.run(Path(__file__).parent / "model", "3B", EPOCHS, LRS)
@@ -1,88 +1,43 @@
-import json
 import os
-from tqdm import tqdm
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
-from sentence_transformers import SentenceTransformer, util
-import time
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference.batched import load_chatml_inputs
+from inference.sweep import sweep_grid, write_dev_output
+from inference.scheduler import run_sharded_sweep
 
 # 설정
-EVAL_FILE = "data/patient_psi_validml.jsonl"
-OUTPUT_FILE = "parameter/psi0.5b_hparam_selection.jsonl"
-BASE_DIR = "/data/yoonsuh0615/repos/patientv2/model/0.5B/model/0.5B_EP{}_LR{}"
-BASE_DIR = BASE_DIR.replace("LR{}", "LR{:.0e}")
+# PROMPT_LAYOUT=prefix_first로 학습한 모델은 같은 프롬프트 배치로 만든 검증셋(testml_generation.py)으로 평가
+PROMPT_LAYOUT = os.getenv("PROMPT_LAYOUT", "original")
+EVAL_FILE = "data/patient_psi_validml_prefix.jsonl" if PROMPT_LAYOUT == "prefix_first" else "data/patient_psi_validml.jsonl"
+MODEL_ROOT = Path(__file__).resolve().parent.parent / "model/0.5B/model"
 EPOCHS = [2, 4, 6, 8, 10]
 LRS = [1e-4, 2e-4, 3e-4, 4e-4, 5e-4]
 MAX_NEW_TOKENS = 200
-
-# 평가 데이터 로드
-with open(EVAL_FILE, "r") as f:
-    eval_lines = [json.loads(l) for l in f.readlines()]
-
-# 결과 저장 리스트
-all_results = []
-
-from pathlib import Path
-for epoch in EPOCHS:
-    for lr in LRS:
-        model_path = Path(__file__).resolve().parent.parent / f"model/0.5B/model/0.5B_EP{epoch}_LR{lr:.0e}".replace("e-0", "e-").replace("e+0", "e+")
-        print(f"\n🚀 Loading model: {model_path}")
-        tokenizer = AutoTokenizer.from_pretrained("Qwen/Qwen2.5-0.5B-Instruct", trust_remote_code=True)
-        model = AutoModelForCausalLM.from_pretrained(
-            pretrained_model_name_or_path=model_path,
-            local_files_only=True,
-            device_map="auto",
-            torch_dtype=torch.bfloat16 if torch.cuda.is_available() else torch.float32,
-            trust_remote_code=True
-        )
-
-        results = {"model_dir": model_path, "responses": []}
-        start_time = time.time()
-        for item in tqdm(eval_lines, desc=f"Evaluating EP{epoch}_LR{lr}"):
-            messages = item["messages"]
-            input_ids = tokenizer.apply_chat_template(messages, return_tensors="pt").to(model.device)
-            with torch.no_grad():
-                output = model.generate(
-                    input_ids,
-                    max_new_tokens=MAX_NEW_TOKENS,
-                    do_sample=True,
-                    temperature=0.7,
-                    top_p=0.9,
-                    pad_token_id=tokenizer.eos_token_id
-                )
-            decoded = tokenizer.decode(output[0], skip_special_tokens=True)
-            prompt = tokenizer.decode(input_ids[0], skip_special_tokens=True)
-            generated = decoded[len(prompt):].strip()
-            results["responses"].append(generated)
-
-            current_step = len(results["responses"])
-            elapsed = time.time() - start_time
-            steps_per_sec = current_step / elapsed if elapsed > 0 else 0
-            total_steps = len(eval_lines)
-            remaining_steps = total_steps - current_step
-            eta_sec = int(remaining_steps / steps_per_sec) if steps_per_sec > 0 else 0
-            eta_min, eta_sec = divmod(eta_sec, 60)
-            print(f"[{current_step}/{total_steps}] 남은 시간: {eta_min}분 {eta_sec}초")
-
-        # 모델별 결과 임시 저장
-        partial_save_path = Path("parameter") / f"result_EP{epoch}_LR{lr:.0e}.json".replace("e-0", "e-").replace("e+0", "e+")
-        with open(partial_save_path, "w") as pf:
-            json.dump({
-                "model_dir": str(model_path),
-                "responses": results["responses"]
-            }, pf, ensure_ascii=False, indent=2)
-
-        all_results.append(results)
-
-
+BATCH_SIZE = 16
+NUM_WORKERS = None  # None이면 GPU 수(없으면 CPU 코어 수) 기준으로 자동 설정
+SHARD_SIZE = 16  # 워커 하나가 한 번에 가져가는 예제 수 (진행 상황 저장 단위)
 OUTPUT_DIR = "parameter/dev_outputs"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-for result in all_results:
-    model_name = Path(result["model_dir"]).name
-    output_file = Path(OUTPUT_DIR) / f"{model_name}.json"
-    with open(output_file, "w") as f:
-        json.dump({
-            "model_dir": str(result["model_dir"]),
-            "responses": result["responses"]
-        }, f, ensure_ascii=False, indent=2)
-print("✅ 모든 모델에 대한 검증 응답 생성 완료:", OUTPUT_DIR)
\ No newline at end of file
+
+# 워커 프로세스(spawn)가 이 스크립트를 다시 import 해도 sweep이 중복 실행되지 않도록 main에서만 실행
+if __name__ == "__main__":
+    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+
+    # 검증셋 전체를 파일 순서대로 사용 (dev_outputs의 응답 인덱스 = 검증셋 인덱스)
+    conversations = load_chatml_inputs(EVAL_FILE, shuffle=False)
+
+    # (체크포인트 × 예제 shard)를 워커 프로세스에 분배. 완료된 dev_outputs와 shard는 건너뜀
+    run_sharded_sweep(
+        sweep_grid(MODEL_ROOT, "0.5B", EPOCHS, LRS),
+        conversations,
+        output_path=lambda name, _: f"{OUTPUT_DIR}/{name}.json",
+        write_fn=write_dev_output,
+        progress_dir="parameter/sweep_progress",
+        workers=NUM_WORKERS,
+        shard_size=SHARD_SIZE,
+        batch_size=BATCH_SIZE,
+        report_path="parameter/sweep_report.json",
+        max_new_tokens=MAX_NEW_TOKENS,
+    )
+    print("✅ 모든 모델에 대한 검증 응답 생성 완료:", OUTPUT_DIR)
@@ -0,0 +1,34 @@
+# 예제별 generate 루프(batch_size=1) vs 배치 생성 속도 비교
+#   python response/bench_batched.py --model-dir model/0.5B/model/0.5B_EP3_LR2e-4 --examples 32
+import argparse
+import sys
+from pathlib import Path
+from transformers import AutoTokenizer, AutoModelForCausalLM
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference.batched import load_chatml_inputs, generate_batched, timed
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--model-dir", default="model/0.5B/model/0.5B_EP3_LR2e-4")
+parser.add_argument("--input-file", default="data/patient_psi_testml.jsonl")
+parser.add_argument("--examples", type=int, default=32)
+parser.add_argument("--batch-sizes", default="4,8,16")
+parser.add_argument("--max-new-tokens", type=int, default=200)
+args = parser.parse_args()
+
+tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+model = AutoModelForCausalLM.from_pretrained(
+    args.model_dir,
+    torch_dtype=torch.bfloat16 if torch.cuda.is_available() else torch.float32,
+    device_map="auto"
+)
+conversations = load_chatml_inputs(args.input_file, args.examples, seed=0)
+
+_, baseline = timed(generate_batched, model, tokenizer, conversations, batch_size=1,
+                    max_new_tokens=args.max_new_tokens, desc="batch_size=1")
+print(f"batch_size= 1: {baseline:7.1f}초 ({len(conversations) / baseline:.2f} 예제/초)")
+for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+    _, elapsed = timed(generate_batched, model, tokenizer, conversations, batch_size=batch_size,
+                       max_new_tokens=args.max_new_tokens, desc=f"batch_size={batch_size}")
+    print(f"batch_size={batch_size:2d}: {elapsed:7.1f}초 ({len(conversations) / elapsed:.2f} 예제/초, x{baseline / elapsed:.1f})")
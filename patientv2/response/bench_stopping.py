@@ -0,0 +1,67 @@
+# TurnStoppingCriteria 유무에 따른 생성 토큰 수/지연 시간 비교
+#   python response/bench_stopping.py --model-dir model/0.5B/model/0.5B_EP3_LR2e-4 --examples 32
+import argparse
+import sys
+import time
+from pathlib import Path
+from transformers import AutoTokenizer, AutoModelForCausalLM, StoppingCriteriaList
+import torch
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference.batched import load_chatml_inputs, encode_conversations, left_pad
+from inference.postprocess import stop_token_ids
+from inference.stopping import TurnStoppingCriteria
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--model-dir", default="model/0.5B/model/0.5B_EP3_LR2e-4")
+parser.add_argument("--input-file", default="data/patient_psi_testml.jsonl")
+parser.add_argument("--examples", type=int, default=32)
+parser.add_argument("--batch-size", type=int, default=8)
+parser.add_argument("--max-new-tokens", type=int, default=200)
+args = parser.parse_args()
+
+tokenizer = AutoTokenizer.from_pretrained(args.model_dir)
+model = AutoModelForCausalLM.from_pretrained(
+    args.model_dir,
+    torch_dtype=torch.bfloat16 if torch.cuda.is_available() else torch.float32,
+    device_map="auto"
+)
+encoded = encode_conversations(tokenizer, load_chatml_inputs(args.input_file, args.examples, seed=0))
+pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+stop_ids = stop_token_ids(tokenizer)
+
+
+def run(stop_early):
+    tokens, elapsed = 0, 0.0
+    torch.manual_seed(0)
+    for start in range(0, len(encoded), args.batch_size):
+        input_ids, attention_mask = left_pad(encoded[start:start + args.batch_size], pad_token_id, model.device)
+        kwargs = {}
+        if stop_early:
+            kwargs["stopping_criteria"] = StoppingCriteriaList([TurnStoppingCriteria(tokenizer, input_ids.shape[1], stop_ids)])
+        begin = time.perf_counter()
+        with torch.no_grad():
+            outputs = model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=args.max_new_tokens,
+                do_sample=True,
+                temperature=0.7,
+                top_p=0.9,
+                pad_token_id=pad_token_id,
+                **kwargs
+            )
+        elapsed += time.perf_counter() - begin
+        # 행별로 끝의 패딩을 제외한 생성 토큰 수
+        for row in outputs[:, input_ids.shape[1]:].tolist():
+            while row and row[-1] == pad_token_id:
+                row.pop()
+            tokens += len(row)
+    return tokens / len(encoded), elapsed
+
+
+baseline_tokens, baseline_time = run(stop_early=False)
+print(f"max_new_tokens만 사용: 평균 {baseline_tokens:6.1f} 토큰, {baseline_time:7.1f}초")
+tokens, elapsed = run(stop_early=True)
+print(f"TurnStoppingCriteria : 평균 {tokens:6.1f} 토큰, {elapsed:7.1f}초 "
+      f"(토큰 {1 - tokens / baseline_tokens:.0%} 감소, x{baseline_time / elapsed:.1f})")
@@ -1,10 +1,13 @@
-import json
-from tqdm import tqdm
+import sys
+from pathlib import Path
 from transformers import AutoTokenizer, AutoModelForCausalLM
 import torch
-import os
-import random
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference.batched import load_chatml_inputs, generate_batched, write_responses, timed
+
 MAX_EXAMPLES = 200  # 원하는 개수로 조절 가능
+BATCH_SIZE = 16  # 한 번의 generate 호출에 묶을 예제 수
 BASE_MODEL_DIR = "model/0.5B/model/0.5B_EP3_LR2e-4"
 MODEL_DIR = BASE_MODEL_DIR
 INPUT_FILE = "data/patient_psi_testml.jsonl"  # ChatML 입력 테스트셋
@@ -18,40 +21,11 @@ model = AutoModelForCausalLM.from_pretrained(
     device_map="auto"
 )
 
-# 텍스트 생성 함수
-def generate_response(chatml_messages, max_new_tokens=200):
-    input_ids = tokenizer.apply_chat_template(chatml_messages, return_tensors="pt").to(model.device)
-    with torch.no_grad():
-        outputs = model.generate(
-            input_ids,
-            max_new_tokens=max_new_tokens,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9,
-            pad_token_id=tokenizer.eos_token_id
-        )
-    decoded = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    full_text = decoded[len(tokenizer.decode(input_ids[0], skip_special_tokens=True)):]
-    return full_text.strip()
-
-
-# 응답 생성 루프
-with open(INPUT_FILE, "r") as f:
-    lines = f.readlines()
-    random.shuffle(lines)  # 랜덤 샘플링
-lines = lines[:MAX_EXAMPLES]
-
-results = []
-for line in tqdm(lines, desc="Generating responses"):
-    item = json.loads(line)
-    messages = item["messages"][:-1]  # system + user (no assistant)
-    response = generate_response(messages)
-    results.append(response)
+# 응답 생성 (랜덤 샘플링 후 배치 생성)
+conversations = load_chatml_inputs(INPUT_FILE, MAX_EXAMPLES)  # system + user (no assistant)
+results, elapsed = timed(generate_batched, model, tokenizer, conversations, batch_size=BATCH_SIZE)
 
 # 저장
-with open(OUTPUT_FILE, "w") as f:
-    for idx, r in enumerate(results):
-        json.dump({"id": idx + 1, "response": r}, f, ensure_ascii=False)
-        f.write("\n")
+write_responses(OUTPUT_FILE, results)
 
-print(f"✅ 응답 생성 완료: {OUTPUT_FILE}")
\ No newline at end of file
+print(f"✅ 응답 생성 완료: {OUTPUT_FILE} ({len(results)}개, {elapsed:.1f}초, {len(results) / elapsed:.2f} 예제/초)")
@@ -1,63 +1,37 @@
-import json
-from tqdm import tqdm
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
-import os
-import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from inference.batched import load_chatml_inputs, write_responses
+from inference.sweep import sweep_grid, SWEEP_SEED
+from inference.scheduler import run_sharded_sweep
 
 EPOCHS = [2, 4, 6, 8, 10]
 LRS = [1e-4, 2e-4, 3e-4, 4e-4, 5e-4]
 
 INPUT_FILE = "data/patient_psi_validml.jsonl"  # ChatML 입력 테스트셋
 MAX_EXAMPLES = 100  # 원하는 개수로 조절 가능
-
-from pathlib import Path
-Path("response/hparam_outputs").mkdir(parents=True, exist_ok=True)
-
-# 텍스트 생성 함수
-def generate_response(chatml_messages, max_new_tokens=200):
-    input_ids = tokenizer.apply_chat_template(chatml_messages, return_tensors="pt").to(model.device)
-    with torch.no_grad():
-        outputs = model.generate(
-            input_ids,
-            max_new_tokens=max_new_tokens,
-            do_sample=True,
-            temperature=0.7,
-            top_p=0.9,
-            pad_token_id=tokenizer.eos_token_id
-        )
-    decoded = tokenizer.decode(outputs[0], skip_special_tokens=True)
-    full_text = decoded[len(tokenizer.decode(input_ids[0], skip_special_tokens=True)):]
-    return full_text.strip()
-
-
-for epoch in EPOCHS:
-    for lr in LRS:
-        model_dir = f"model/0.5B/model/0.5B_EP{epoch}_LR{lr:.0e}".replace("e-0", "e-").replace("e+0", "e+")
-        output_file = f"response/hparam_outputs/openpsi0.5B_EP{epoch}_LR{lr:.0e}.jsonl".replace("e-0", "e-").replace("e+0", "e+")
-
-        tokenizer = AutoTokenizer.from_pretrained(model_dir)
-        model = AutoModelForCausalLM.from_pretrained(
-            model_dir,
-            torch_dtype=torch.bfloat16 if torch.cuda.is_available() else torch.float32,
-            device_map="auto"
-        )
-
-        with open(INPUT_FILE, "r") as f:
-            lines = f.readlines()
-            random.shuffle(lines)
-        lines = lines[:MAX_EXAMPLES]
-
-        results = []
-        for line in tqdm(lines, desc=f"EP{epoch}_LR{lr:.0e}"):
-            item = json.loads(line)
-            messages = item["messages"][:-1]
-            response = generate_response(messages)
-            results.append(response)
-
-        with open(output_file, "w") as f:
-            for idx, r in enumerate(results):
-                json.dump({"id": idx + 1, "response": r}, f, ensure_ascii=False)
-                f.write("\n")
-
-        print(f"✅ EP{epoch}, LR{lr:.0e} 응답 저장 완료: {output_file}")
\ No newline at end of file
+BATCH_SIZE = 16  # 한 번의 generate 호출에 묶을 예제 수
+NUM_WORKERS = None  # None이면 GPU 수(없으면 CPU 코어 수) 기준으로 자동 설정
+SHARD_SIZE = 16  # 워커 하나가 한 번에 가져가는 예제 수 (진행 상황 저장 단위)
+OUTPUT_DIR = "response/hparam_outputs"
+
+# 워커 프로세스(spawn)가 이 스크립트를 다시 import 해도 sweep이 중복 실행되지 않도록 main에서만 실행
+if __name__ == "__main__":
+    Path(OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
+
+    # 모든 체크포인트가 같은 예제 subset으로 평가되도록 시드 고정
+    conversations = load_chatml_inputs(INPUT_FILE, MAX_EXAMPLES, seed=SWEEP_SEED)
+
+    # (체크포인트 × 예제 shard)를 워커 프로세스에 분배. 워커마다 베이스 모델은 한 번만 로드하고 어댑터만 교체
+    run_sharded_sweep(
+        sweep_grid("model/0.5B/model", "0.5B", EPOCHS, LRS),
+        conversations,
+        output_path=lambda name, _: f"{OUTPUT_DIR}/openpsi{name}.jsonl",
+        write_fn=write_responses,
+        progress_dir=f"{OUTPUT_DIR}/progress_0.5B",
+        workers=NUM_WORKERS,
+        shard_size=SHARD_SIZE,
+        batch_size=BATCH_SIZE,
+        report_path=f"{OUTPUT_DIR}/openpsi0.5B_sweep_report.json",
+    )
@@ -1,53 +1,66 @@
 import json
 import random
-from tqdm import tqdm
-import os
-import openai
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from llm.batch import run_requests
+from llm.cache import llm_cache
+
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
 
 # 경로 설정
 INPUT_FILE = "data/patient_psi_testml.jsonl"  # ChatML 입력 테스트셋
 OUTPUT_FILE = "response/gpt4nano_response.jsonl"  # 생성된 응답 저장 경로
+BATCH_STATE_FILE = "response/gpt4nano_batch.json"  # OPENAI_BATCH=submit/collect 사이에 배치 id를 보관
 
 # 최대 생성 개수
 MAX_EXAMPLES = 200
+SEED = 42  # submit/collect를 따로 실행해도 같은 예제가 선택되도록 고정
+
+
+# 응답 생성 요청 (동기 호출과 Batch API가 같은 본문을 사용)
+def build_request(messages, model="gpt-4.1-mini"):
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": 0.7,
+        "top_p": 0.9,
+        "stop": ["Therapist:"],  # 치료사 턴을 이어서 쓰기 시작하면 바로 중단
+    }
 
-# 응답 생성 함수
-def generate_response(messages, model="gpt-4.1-mini"):
-    response = openai.ChatCompletion.create(
-        model=model,
-        messages=messages,
-        temperature=0.7,
-        top_p=0.9,
-    )
-    return response.choices[0].message.content.strip()
 
 # 입력 데이터 불러오기
 with open(INPUT_FILE, "r") as f:
     lines = f.readlines()
-    random.shuffle(lines)
+    random.Random(SEED).shuffle(lines)
 lines = lines[:MAX_EXAMPLES]
 
-# 응답 생성 루프
-results = []
-for line in tqdm(lines, desc="Generating responses with GPT-4.1-nano"):
-    item = json.loads(line)
-    # Use the system + user messages from the dataset directly
-    messages = item["messages"]
-    full_response = generate_response(messages)
-    # Extract full response as patient's reply
-    response = full_response.strip()
-    results.append({
-        "id": len(results) + 1,
-        "response": response
-    })
+# system + user 메시지만 사용 (마지막 assistant 정답은 제외)
+requests = [
+    (f"resp-{idx + 1}", build_request(json.loads(line)["messages"][:-1]), 0)
+    for idx, line in enumerate(lines)
+]
+
+# OPENAI_BATCH 설정에 따라 동기 호출 또는 Batch API로 응답 생성
+responses = run_requests(requests, BATCH_STATE_FILE)
+if responses is None:
+    print(f"📤 배치 제출 완료. 끝나면 OPENAI_BATCH=collect로 다시 실행: {BATCH_STATE_FILE}")
+    sys.exit(0)
+
+results = [
+    {"id": idx + 1, "response": responses[custom_id].strip()}
+    for idx, (custom_id, _, _) in enumerate(requests)
+    if custom_id in responses
+]
+if len(results) < len(requests):
+    print(f"⚠️ 응답을 받지 못한 요청 {len(requests) - len(results)}개 (다시 실행하면 해당 요청만 재시도)")
 
 # 저장
 with open(OUTPUT_FILE, "w") as f:
     for r in results:
         f.write(json.dumps(r, ensure_ascii=False) + "\n")
 
-print(f"✅ GPT-4.1-nano 응답 생성 완료 (응답만 저장됨): {OUTPUT_FILE}")
\ No newline at end of file
+print(f"✅ GPT-4.1-nano 응답 생성 완료 (응답만 저장됨): {OUTPUT_FILE}")
+llm_cache.print_stats()
@@ -0,0 +1,66 @@
+import argparse
+import random
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from training.dataset_cache import TOKEN_CACHE_DIR
+from training.packing import pack_examples, PACK_TOKENS
+
+# 토큰 캐시의 예제 길이만으로 배치 구성 방식별 패딩 비율과 계산량(패딩 포함 위치 수)을 비교
+#   python training/bench_packing.py                       # data/token_cache의 가장 최근 캐시
+#   python training/bench_packing.py --cache data/token_cache/<지문> --batch-size 2 --grad-accum 8
+# 실제 학습 tokens/sec는 psi_*.py 실행 시 ThroughputCallback이 output_dir/throughput.json에 기록
+
+
+def padded_positions(lengths, batches):
+    return sum(len(b) * int(lengths[b].max()) for b in batches)
+
+
+def random_batches(n, batch_size, seed):
+    order = list(range(n))
+    random.Random(seed).shuffle(order)
+    return [np.array(order[i:i + batch_size]) for i in range(0, n, batch_size)]
+
+
+def bucketed_batches(lengths, batch_size, grad_accum, seed):
+    # transformers LengthGroupedSampler와 같은 방식: 섞은 뒤 megabatch(batch * accum * 50) 안에서 길이순 정렬
+    order = list(range(len(lengths)))
+    random.Random(seed).shuffle(order)
+    mega = batch_size * grad_accum * 50
+    batches = []
+    for i in range(0, len(order), mega):
+        chunk = sorted(order[i:i + mega], key=lambda j: -int(lengths[j]))
+        batches.extend(np.array(chunk[k:k + batch_size]) for k in range(0, len(chunk), batch_size))
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cache", default=None)
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--grad-accum", type=int, default=8)
+    parser.add_argument("--pack-tokens", type=int, default=PACK_TOKENS)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    cache = Path(args.cache) if args.cache else max(Path(TOKEN_CACHE_DIR).glob("*/lengths.npy"), key=lambda p: p.stat().st_mtime).parent
+    lengths = np.load(cache / "lengths.npy")
+    tokens = int(lengths.sum())
+    print(f"📦 {cache}: 예제 {len(lengths)}개, 토큰 {tokens}개 (평균 {lengths.mean():.0f}, 최대 {lengths.max()})")
+
+    results = {
+        "pad": padded_positions(lengths, random_batches(len(lengths), args.batch_size, args.seed)),
+        "bucket": padded_positions(lengths, bucketed_batches(lengths, args.batch_size, args.grad_accum, args.seed)),
+        "pack": tokens,
+    }
+    packs = pack_examples(lengths, args.pack_tokens)
+    print(f"   pack: 블록 {len(packs)}개 (블록당 예제 {len(lengths) / len(packs):.1f}개, 채움률 {tokens / (len(packs) * args.pack_tokens):.1%})")
+    for mode, positions in results.items():
+        print(f"{mode:>7}: 위치 {positions}개, 패딩 {1 - tokens / positions:.1%}, pad 대비 계산량 {positions / results['pad']:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# ChatML JSONL을 한 번만 토크나이즈해 디스크에 캐시 (input_ids/labels를 이어 붙인 1차원 int32 배열 + offsets)
+# 데이터 파일 내용과 토크나이저가 같으면 같은 캐시를 memory-map으로 다시 열기 때문에
+# LR/epoch sweep의 모든 run과 다른 프로세스가 토크나이즈 없이 같은 데이터를 공유
+TOKEN_CACHE_DIR = os.getenv("PSI_TOKEN_CACHE", str(Path(__file__).resolve().parent.parent / "data" / "token_cache"))
+CACHE_FORMAT_VERSION = 1
+TOKENIZE_CHUNK = 1000
+ARRAYS = ("input_ids", "labels", "offsets", "lengths")
+
+
+# ChatML 메시지를 학습용 (prompt, assistant 응답)으로 변환 (assistant가 없으면 None)
+def format_example(messages):
+    prompt_parts = []
+    assistant_text = None
+
+    for msg in messages:
+        role = msg["role"]
+        content = msg["content"].strip()
+        if role == "assistant":
+            assistant_text = content
+            break
+        prompt_parts.append(f"<|im_start|>{role}\n{content}<|im_end|>")
+
+    if not assistant_text:
+        return None
+    prompt = "\n".join(prompt_parts) + "\n<|im_start|>assistant\n"
+    return prompt, assistant_text
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def dataset_fingerprint(data_file, tokenizer, shared_prefix=False):
+    # 데이터 내용 + 토크나이저(이름, 어휘 크기, 특수 토큰) + 캐시 형식이 같으면 같은 지문
+    signature = {
+        "shared_prefix": shared_prefix,
+        "data": file_sha256(data_file),
+        "tokenizer": getattr(tokenizer, "name_or_path", type(tokenizer).__name__),
+        "vocab_size": len(tokenizer),
+        "special_tokens": tokenizer.special_tokens_map,
+        "model_max_length": tokenizer.model_max_length,
+        "version": CACHE_FORMAT_VERSION,
+    }
+    return hashlib.sha256(json.dumps(signature, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def common_prefix(prompts):
+    # 모든 prompt가 공유하는 앞부분 (토큰 경계가 어긋나지 않도록 마지막 줄바꿈까지만)
+    prefix = os.path.commonprefix(prompts)
+    return prefix[:prefix.rfind("\n") + 1]
+
+
+def build_token_cache(data_file, tokenizer, cache_dir, shared_prefix=False):
+    # 기존 format_and_tokenize와 같은 토큰화 (prompt는 -100으로 마스킹), chunk 단위로 배치 토크나이즈
+    # shared_prefix=True이면 모든 prompt에 공통인 앞부분을 prefix_ids로 따로 저장하고 예제에는 나머지만 저장
+    with open(data_file, "r") as f:
+        pairs = [format_example(json.loads(line)["messages"]) for line in f if line.strip()]
+    pairs = [p for p in pairs if p is not None]
+
+    prefix_ids = []
+    if shared_prefix:
+        prefix = common_prefix([p for p, _ in pairs])
+        prefix_ids = tokenizer(prefix, truncation=True, padding=False, add_special_tokens=False)["input_ids"]
+        pairs = [(p[len(prefix):], a) for p, a in pairs]
+        joined = tokenizer(prefix + pairs[0][0], padding=False, add_special_tokens=False)["input_ids"]
+        split = prefix_ids + tokenizer(pairs[0][0], padding=False, add_special_tokens=False)["input_ids"]
+        if joined != split:
+            print("⚠️ 공통 prefix 경계에서 토큰화가 달라짐 (prefix를 따로 토크나이즈한 결과로 학습)")
+
+    input_ids, labels, lengths = [], [], []
+    for start in range(0, len(pairs), TOKENIZE_CHUNK):
+        chunk = pairs[start:start + TOKENIZE_CHUNK]
+        prompts = tokenizer([p for p, _ in chunk], truncation=True, padding=False, add_special_tokens=False)["input_ids"]
+        replies = tokenizer([a for _, a in chunk], truncation=True, padding=False, add_special_tokens=False)["input_ids"]
+        for prompt_ids, reply_ids in zip(prompts, replies):
+            input_ids.extend(prompt_ids)
+            input_ids.extend(reply_ids)
+            labels.extend([-100] * len(prompt_ids))
+            labels.extend(reply_ids)
+            lengths.append(len(prompt_ids) + len(reply_ids))
+
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    arrays = {
+        "input_ids": np.asarray(input_ids, dtype=np.int32),
+        "labels": np.asarray(labels, dtype=np.int32),
+        "offsets": offsets,
+        "lengths": np.asarray(lengths, dtype=np.int32),
+    }
+    if shared_prefix:
+        arrays["prefix_ids"] = np.asarray(prefix_ids, dtype=np.int32)
+
+    # 임시 디렉토리에 다 쓴 뒤 rename → 다른 프로세스는 완성된 캐시만 봄
+    cache_dir = Path(cache_dir)
+    cache_dir.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=cache_dir.name + ".", dir=cache_dir.parent))
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", array)
+    with open(tmp_dir / "meta.json", "w") as f:
+        json.dump({
+            "data_file": str(data_file),
+            "examples": len(lengths),
+            "tokens": int(offsets[-1]),
+            "prefix_tokens": len(prefix_ids),
+            "version": CACHE_FORMAT_VERSION,
+        }, f, indent=2)
+    try:
+        os.rename(tmp_dir, cache_dir)
+    except OSError:
+        # 동시에 만든 다른 프로세스가 먼저 끝냈으면 그 캐시를 사용
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not (cache_dir / "meta.json").exists():
+            raise
+
+
+class TokenizedDataset(torch.utils.data.Dataset):
+    # 예제 i는 memory-map된 배열의 view (복사/텐서 생성 없음). 텐서는 collator가 배치 단위로 한 번만 만듦
+    def __init__(self, cache_dir):
+        self._open(Path(cache_dir))
+
+    def _open(self, cache_dir):
+        self.cache_dir = cache_dir
+        arrays = {name: np.load(self.cache_dir / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+        self.input_ids = arrays["input_ids"]
+        self.labels = arrays["labels"]
+        self.offsets = arrays["offsets"]
+        self.lengths = arrays["lengths"]
+        # shared_prefix 캐시이면 모든 예제 앞에 붙는 공통 prefix 토큰, 아니면 None
+        prefix_path = self.cache_dir / "prefix_ids.npy"
+        self.prefix_ids = np.load(prefix_path) if prefix_path.exists() else None
+
+    # DataLoader 워커로 보낼 때 배열 내용 대신 경로만 넘기고 워커에서 다시 memory-map
+    def __getstate__(self):
+        return {"cache_dir": self.cache_dir}
+
+    def __setstate__(self, state):
+        self._open(state["cache_dir"])
+
+    def __len__(self):
+        return len(self.lengths)
+
+    def __getitem__(self, idx):
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return {"input_ids": self.input_ids[start:end], "labels": self.labels[start:end]}
+
+
+def load_tokenized(data_file, tokenizer, cache_root=TOKEN_CACHE_DIR, shared_prefix=False):
+    cache_dir = Path(cache_root) / dataset_fingerprint(data_file, tokenizer, shared_prefix)
+    if (cache_dir / "meta.json").exists():
+        print(f"📦 토큰 캐시 사용: {cache_dir}")
+    else:
+        print(f"🔤 토크나이즈 후 캐시 저장: {data_file} → {cache_dir}")
+        build_token_cache(data_file, tokenizer, cache_dir, shared_prefix)
+    dataset = TokenizedDataset(cache_dir)
+    print(f"   예제 {len(dataset)}개, 토큰 {int(dataset.offsets[-1])}개")
+    if dataset.prefix_ids is not None:
+        print(f"   공통 prefix {len(dataset.prefix_ids)} 토큰 (배치당 한 번만 계산)")
+    return dataset
+
+
+class PaddingCollator:
+    # 배치마다 (B, 최대 길이) 배열을 한 번 만들고 각 예제 view를 복사해 넣음 → 텐서 생성은 배치당 3번
+    def __init__(self, pad_token_id, label_pad_id=-100):
+        self.pad_token_id = pad_token_id
+        self.label_pad_id = label_pad_id
+
+    def __call__(self, batch):
+        lengths = np.fromiter((len(item["input_ids"]) for item in batch), dtype=np.int64, count=len(batch))
+        shape = (len(batch), int(lengths.max()))
+        input_ids = np.full(shape, self.pad_token_id, dtype=np.int64)
+        labels = np.full(shape, self.label_pad_id, dtype=np.int64)
+        for row, item in enumerate(batch):
+            input_ids[row, :lengths[row]] = item["input_ids"]
+            labels[row, :lengths[row]] = item["labels"]
+        attention_mask = (np.arange(shape[1]) < lengths[:, None]).astype(np.int64)
+        return {
+            "input_ids": torch.from_numpy(input_ids),
+            "attention_mask": torch.from_numpy(attention_mask),
+            "labels": torch.from_numpy(labels),
+        }
@@ -0,0 +1,142 @@
+import os
+import shutil
+from pathlib import Path
+
+import torch
+from peft import get_peft_model_state_dict, set_peft_model_state_dict
+from transformers import Trainer, TrainerCallback, TrainingArguments, set_seed
+
+from inference.sweep import checkpoint_name
+
+# (epoch, LR) sweep 실행기
+# - 모든 config가 같은 LoRA 초기 가중치에서 새로 시작 (이전 config의 학습 결과를 이어받지 않음)
+# - LR 스케줄이 전체 길이와 무관한 경우(constant 계열) 같은 LR의 config들은 가장 긴 epoch까지 한 번만 학습하고
+#   중간 epoch마다 어댑터를 저장 (예: EP10 한 번으로 EP2/4/6/8/10). cosine처럼 전체 길이에 따라 스케줄이
+#   달라지면 config마다 따로 학습
+# - SAVE_STEPS마다 Trainer 체크포인트를 남겨 중단되면 마지막 step부터 이어서 학습
+PSI_LR_SCHEDULER = os.getenv("PSI_LR_SCHEDULER", "cosine")
+PREFIX_SCHEDULERS = {"constant", "constant_with_warmup"}
+SAVE_STEPS = int(os.getenv("PSI_SAVE_STEPS", "50"))
+SWEEP_SEED = 42
+
+
+def is_done(adapter_dir):
+    # save_pretrained가 끝난 디렉토리만 완료로 봄 (Trainer 체크포인트만 있는 디렉토리는 미완료)
+    return (Path(adapter_dir) / "adapter_config.json").exists()
+
+
+def has_checkpoint(output_dir):
+    return Path(output_dir).is_dir() and any(p.name.startswith("checkpoint-") for p in Path(output_dir).iterdir())
+
+
+def plan_runs(model_root, prefix, epochs, lrs, scheduler=PSI_LR_SCHEDULER):
+    # [(학습 디렉토리, lr, 학습할 epoch 수, {저장할 epoch: 어댑터 디렉토리})]. 이미 저장된 config는 제외
+    runs = []
+    for lr in lrs:
+        targets = {epoch: Path(model_root) / checkpoint_name(prefix, epoch, lr) for epoch in epochs}
+        targets = {epoch: path for epoch, path in targets.items() if not is_done(path)}
+        if not targets:
+            continue
+        if scheduler in PREFIX_SCHEDULERS:
+            run_dir = Path(model_root) / (checkpoint_name(prefix, max(epochs), lr) + f"_{scheduler}_run")
+            runs.append((run_dir, lr, max(targets), targets))
+        else:
+            for epoch, path in targets.items():
+                runs.append((path, lr, epoch, {epoch: path}))
+    return runs
+
+
+def save_adapter(model, tokenizer, adapter_dir):
+    # 임시 디렉토리에 저장한 뒤 adapter 파일만 옮겨 완료 표시(adapter_config.json)가 마지막에 생기도록 함
+    adapter_dir = Path(adapter_dir)
+    tmp_dir = adapter_dir.with_name(adapter_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    model.save_pretrained(tmp_dir)
+    tokenizer.save_pretrained(tmp_dir)
+    adapter_dir.mkdir(parents=True, exist_ok=True)
+    files = sorted(tmp_dir.iterdir(), key=lambda p: p.name == "adapter_config.json")
+    for f in files:
+        os.replace(f, adapter_dir / f.name)
+    tmp_dir.rmdir()
+
+
+class EpochSnapshotCallback(TrainerCallback):
+    # epoch이 끝날 때 그 epoch에 해당하는 config의 어댑터를 저장 (prefix 공유 run)
+    def __init__(self, targets, tokenizer):
+        self.targets = targets
+        self.tokenizer = tokenizer
+
+    def on_epoch_end(self, args, state, control, model=None, **kwargs):
+        epoch = int(round(state.epoch))
+        path = self.targets.get(epoch)
+        if path is not None and not is_done(path):
+            save_adapter(model, self.tokenizer, path)
+            print(f"📸 epoch {epoch} 어댑터 저장: {path}")
+
+
+class SweepOrchestrator:
+    # model: get_peft_model 결과. 생성 직후의 LoRA 가중치를 보관해 두고 run마다 그 상태로 되돌림
+    def __init__(self, model, tokenizer, train_dataset, data_collator, training_kwargs, callbacks=None, seed=SWEEP_SEED,
+                 trainer_cls=Trainer, trainer_kwargs=None):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.train_dataset = train_dataset
+        self.data_collator = data_collator
+        self.training_kwargs = training_kwargs
+        self.callbacks = callbacks or []
+        self.seed = seed
+        self.trainer_cls = trainer_cls
+        self.trainer_kwargs = trainer_kwargs or {}
+        self.initial_lora = {k: v.detach().clone().cpu() for k, v in get_peft_model_state_dict(model).items()}
+
+    def reset_lora(self):
+        set_peft_model_state_dict(self.model, self.initial_lora)
+
+    def train_run(self, run_dir, lr, epochs, targets, scheduler):
+        set_seed(self.seed)
+        self.reset_lora()
+        args = TrainingArguments(
+            output_dir=str(run_dir),
+            learning_rate=lr,
+            num_train_epochs=epochs,
+            lr_scheduler_type=scheduler,
+            save_strategy="steps",
+            save_steps=SAVE_STEPS,
+            save_total_limit=2,
+            seed=self.seed,
+            **self.training_kwargs,
+        )
+        snapshot = EpochSnapshotCallback(targets, self.tokenizer)
+        trainer = self.trainer_cls(
+            model=self.model,
+            args=args,
+            train_dataset=self.train_dataset,
+            tokenizer=self.tokenizer,
+            data_collator=self.data_collator,
+            callbacks=self.callbacks + [snapshot],
+            **self.trainer_kwargs
+        )
+        # 체크포인트가 있으면 LoRA 가중치/optimizer/스케줄러/RNG를 복원해 마지막 step부터 이어서 학습
+        resume = has_checkpoint(run_dir)
+        print(f"🚀 Start training: epoch={epochs}, lr={lr}, scheduler={scheduler}" + (" (resume)" if resume else ""))
+        trainer.train(resume_from_checkpoint=True if resume else None)
+        final = targets.get(epochs)
+        if final is not None and not is_done(final):
+            save_adapter(self.model, self.tokenizer, final)
+        torch.cuda.empty_cache()
+
+    def run(self, model_root, prefix, epochs, lrs, scheduler=PSI_LR_SCHEDULER):
+        runs = plan_runs(model_root, prefix, epochs, lrs, scheduler)
+        total = len(epochs) * len(lrs)
+        pending = sum(len(targets) for *_, targets in runs)
+        train_epochs = sum(e for _, _, e, _ in runs)
+        print(f"🧮 config {pending}/{total}개 남음 → 학습 run {len(runs)}개, 총 {train_epochs} epoch (scheduler={scheduler})")
+        for run_dir, lr, run_epochs, targets in runs:
+            self.train_run(run_dir, lr, run_epochs, targets, scheduler)
+            for epoch, path in sorted(targets.items()):
+                if is_done(path):
+                    print(f"✅ Finished training: {path}")
+                else:
+                    print(f"⚠️ 어댑터가 저장되지 않음: {path} (run 디렉토리를 지우고 다시 실행하면 처음부터 학습)")
+            if scheduler in PREFIX_SCHEDULERS and all(is_done(p) for p in targets.values()):
+                shutil.rmtree(run_dir, ignore_errors=True)  # 공유 run의 중간 체크포인트 정리
@@ -0,0 +1,164 @@
+import bisect
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+from transformers import TrainerCallback
+
+from training.dataset_cache import PaddingCollator
+
+# 학습 배치 구성 방식
+#   pad     : 기존과 같이 무작위 배치를 가장 긴 예제에 맞춰 패딩 (기본, 기존 학습 결과를 그대로 재현)
+#   bucket  : 길이가 비슷한 예제끼리 배치 (TrainingArguments.group_by_length)
+#   pack    : 여러 예제를 PACK_TOKENS 길이 블록으로 이어 붙이고 예제마다 position_ids를 0부터 다시 시작
+#             (flash_attention_2가 position_ids 경계로 varlen attention을 계산 → 예제끼리 서로 보지 않음)
+PSI_TRAIN_MODE = os.getenv("PSI_TRAIN_MODE", "pad")
+PACK_TOKENS = int(os.getenv("PACK_TOKENS", "4096"))
+
+
+def pack_examples(lengths, max_tokens=PACK_TOKENS):
+    # best-fit decreasing: 긴 예제부터 남은 공간이 가장 작으면서 들어갈 수 있는 블록에 넣음
+    # (남은 공간을 정렬된 리스트로 관리해 O(n log n)). max_tokens보다 긴 예제는 혼자 한 블록
+    packs, free = [], []  # free: 정렬된 (남은 공간, 블록 번호)
+    for idx in sorted(range(len(lengths)), key=lambda i: -int(lengths[i])):
+        length = int(lengths[idx])
+        pos = bisect.bisect_left(free, (length, -1))
+        if pos < len(free):
+            room, p = free.pop(pos)
+            packs[p].append(idx)
+        else:
+            room, p = max_tokens, len(packs)
+            packs.append([idx])
+        room -= length
+        if room > 0:
+            bisect.insort(free, (room, p))
+    return packs
+
+
+class PackedDataset(torch.utils.data.Dataset):
+    # 아이템 하나가 블록 하나 (예제 view 리스트). Trainer가 블록 순서를 섞음
+    def __init__(self, dataset, max_tokens=PACK_TOKENS):
+        self.dataset = dataset
+        self.max_tokens = max_tokens
+        self.packs = pack_examples(dataset.lengths, max_tokens)
+        self.examples_per_pack = len(dataset) / max(1, len(self.packs))
+
+    def __len__(self):
+        return len(self.packs)
+
+    def __getitem__(self, idx):
+        return [self.dataset[i] for i in self.packs[idx]]
+
+
+class TokenStats:
+    # collator가 만든 배치의 실제 토큰 수 / 패딩 포함 위치 수 (dataloader_num_workers=0일 때 정확)
+    def __init__(self):
+        self.tokens = 0
+        self.positions = 0
+
+    def add(self, tokens, positions):
+        self.tokens += int(tokens)
+        self.positions += int(positions)
+
+
+class PackedCollator:
+    # 배치 안의 모든 블록을 패딩 없이 한 줄로 이어 붙임. labels의 -100 마스킹은 그대로,
+    # 각 예제의 첫 토큰 label은 -100으로 두어 앞 예제의 마지막 토큰이 다음 예제를 예측하지 않게 함
+    def __init__(self, stats=None):
+        self.stats = stats
+
+    def __call__(self, batch):
+        examples = [example for pack in batch for example in pack]
+        total = sum(len(e["input_ids"]) for e in examples)
+        input_ids = np.empty((1, total), dtype=np.int64)
+        labels = np.empty((1, total), dtype=np.int64)
+        position_ids = np.empty((1, total), dtype=np.int64)
+        start = 0
+        for e in examples:
+            end = start + len(e["input_ids"])
+            input_ids[0, start:end] = e["input_ids"]
+            labels[0, start:end] = e["labels"]
+            labels[0, start] = -100
+            position_ids[0, start:end] = np.arange(end - start)
+            start = end
+        if self.stats is not None:
+            self.stats.add(total, total)
+        return {
+            "input_ids": torch.from_numpy(input_ids),
+            "labels": torch.from_numpy(labels),
+            "position_ids": torch.from_numpy(position_ids),
+        }
+
+
+class CountingPaddingCollator(PaddingCollator):
+    def __init__(self, pad_token_id, stats=None, label_pad_id=-100):
+        super().__init__(pad_token_id, label_pad_id)
+        self.stats = stats
+
+    def __call__(self, batch):
+        out = super().__call__(batch)
+        if self.stats is not None:
+            self.stats.add(out["attention_mask"].sum(), out["attention_mask"].numel())
+        return out
+
+
+class ThroughputCallback(TrainerCallback):
+    # 로그마다 실제 토큰/초와 패딩 비율을 출력하고, 학습이 끝나면 output_dir/throughput.json에 저장
+    def __init__(self, stats, mode):
+        self.stats = stats
+        self.mode = mode
+        self.start = None
+
+    def on_train_begin(self, args, state, control, **kwargs):
+        self.start = time.time()
+        self.stats.tokens = self.stats.positions = 0
+
+    def summary(self):
+        elapsed = max(time.time() - self.start, 1e-9)
+        return {
+            "mode": self.mode,
+            "seconds": round(elapsed, 1),
+            "tokens": self.stats.tokens,
+            "positions": self.stats.positions,
+            "tokens_per_sec": round(self.stats.tokens / elapsed, 1),
+            "padding_ratio": round(1 - self.stats.tokens / self.stats.positions, 4) if self.stats.positions else 0.0,
+        }
+
+    def on_log(self, args, state, control, logs=None, **kwargs):
+        s = self.summary()
+        print(f"⚡ [{self.mode}] step {state.global_step}: {s['tokens_per_sec']:.0f} tokens/sec, 패딩 {s['padding_ratio']:.1%}")
+
+    def on_train_end(self, args, state, control, **kwargs):
+        s = self.summary()
+        Path(args.output_dir).mkdir(parents=True, exist_ok=True)
+        with open(Path(args.output_dir) / "throughput.json", "w") as f:
+            json.dump(s, f, indent=2)
+        print(f"⚡ [{self.mode}] 평균 {s['tokens_per_sec']:.0f} tokens/sec, 패딩 {s['padding_ratio']:.1%} ({s['seconds']}초)")
+
+
+def training_setup(dataset, tokenizer, mode=PSI_TRAIN_MODE, batch_size=2, grad_accum=8, pack_tokens=PACK_TOKENS):
+    # 모드별 (train_dataset, data_collator, TrainingArguments 추가 인자, callbacks)
+    # pack 모드는 블록 하나가 약 batch_size개 예제보다 많으므로 optimizer step당 예제 수가 기존(batch_size * grad_accum)과
+    # 비슷해지도록 gradient_accumulation_steps를 줄임
+    if mode not in ("pad", "bucket", "pack"):
+        raise ValueError(f"PSI_TRAIN_MODE must be pad/bucket/pack, got {mode!r}")
+    stats = TokenStats()
+    callbacks = [ThroughputCallback(stats, mode)]
+    if mode == "pack":
+        if getattr(dataset, "prefix_ids", None) is not None:
+            raise ValueError("PSI_TRAIN_MODE=pack은 공통 prefix 공유 학습(PSI_SHARED_PREFIX=1)과 함께 쓸 수 없음")
+        packed = PackedDataset(dataset, pack_tokens)
+        accum = max(1, round(batch_size * grad_accum / packed.examples_per_pack))
+        print(f"📦 packing: 예제 {len(dataset)}개 → 블록 {len(packed)}개 (블록당 {packed.examples_per_pack:.1f}개), grad accum {accum}")
+        args = {"per_device_train_batch_size": 1, "gradient_accumulation_steps": accum}
+        return packed, PackedCollator(stats), args, callbacks
+    args = {"per_device_train_batch_size": batch_size, "gradient_accumulation_steps": grad_accum, "group_by_length": mode == "bucket"}
+    return dataset, CountingPaddingCollator(tokenizer.pad_token_id, stats), args, callbacks
+
+
+def attn_implementation(mode=PSI_TRAIN_MODE):
+    # packing은 position_ids 경계를 varlen attention으로 처리하는 flash_attention_2가 필요
+    return "flash_attention_2" if mode == "pack" else None
@@ -0,0 +1,55 @@
+import numpy as np
+import torch
+from transformers import DynamicCache, Trainer
+
+# 공통 prefix 공유 학습: 모든 예제가 같은 지시문으로 시작하므로 (PROMPT_LAYOUT=prefix_first이면 prompt의 절반 가량)
+# 배치마다 prefix를 한 번만 forward 해서 KV를 만들고, 배치의 모든 예제가 그 KV 뒤에 이어서 forward
+# LoRA가 q/k/v/o에 붙어 있으므로 prefix KV도 학습 중 계속 바뀜 → step마다 새로 계산하되 예제 수만큼 반복하지 않음
+# (prefix의 gradient는 배치 전체의 loss에서 한 번에 흘러 들어감). 데이터는 load_tokenized(..., shared_prefix=True)
+
+
+def expand_cache(cache, batch_size):
+    # batch 1로 계산한 prefix KV를 batch_size로 복사 없이 확장 (expand view)
+    legacy = cache.to_legacy_cache() if hasattr(cache, "to_legacy_cache") else cache
+    return DynamicCache.from_legacy_cache(tuple(
+        (key.expand(batch_size, -1, -1, -1), value.expand(batch_size, -1, -1, -1)) for key, value in legacy
+    ))
+
+
+class SharedPrefixTrainer(Trainer):
+    def __init__(self, *args, prefix_ids=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefix_ids = torch.as_tensor(np.asarray(prefix_ids), dtype=torch.long).unsqueeze(0)
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        input_ids = inputs["input_ids"]
+        batch_size, length = input_ids.shape
+        prefix = self.prefix_ids.to(input_ids.device)
+        prefix_len = prefix.shape[1]
+
+        # prefix는 lm_head(어휘 크기 logits) 없이 decoder만 통과시켜 KV만 얻음
+        decoder = self.accelerator.unwrap_model(model).get_base_model().model
+        prefix_kv = decoder(input_ids=prefix, use_cache=True).past_key_values
+
+        attention_mask = torch.cat([inputs["attention_mask"].new_ones(batch_size, prefix_len), inputs["attention_mask"]], dim=1)
+        position_ids = torch.arange(prefix_len, prefix_len + length, device=input_ids.device).expand(batch_size, -1)
+        loss_kwargs = {}
+        if getattr(self, "model_accepts_loss_kwargs", False) and kwargs.get("num_items_in_batch") is not None:
+            loss_kwargs["num_items_in_batch"] = kwargs["num_items_in_batch"]
+        outputs = model(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            past_key_values=expand_cache(prefix_kv, batch_size),
+            labels=inputs["labels"],
+            use_cache=True,  # 일부 transformers 버전은 use_cache=False이면 past_key_values 길이를 무시
+            **loss_kwargs,
+        )
+        return (outputs.loss, outputs) if return_outputs else outputs.loss
+
+
+def trainer_for(dataset):
+    # (Trainer 클래스, 추가 인자): shared_prefix 캐시이면 SharedPrefixTrainer
+    if getattr(dataset, "prefix_ids", None) is None:
+        return Trainer, {}
+    return SharedPrefixTrainer, {"prefix_ids": dataset.prefix_ids}